@@ -0,0 +1,112 @@
+"""
+Memory held by parsed entitlements of a large library: raw dicts decoded with `json.loads`
+(as kept before) vs compact `Entitlement` records built by `OriginBackendClient.get_entitlements`.
+
+    python benchmarks/entitlements_memory.py --entitlements 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from backend import OriginBackendClient  # noqa: E402
+from host_routing import PinnedHostSelector  # noqa: E402
+
+
+def create_payload(count: int) -> bytes:
+    """Entitlements with the fields consolidatedentitlements endpoint returns"""
+    offer_types = ["basegame", "basegame", "dlc", "extracontent"]
+    external_types = [None, None, "STEAM", "SUBSCRIPTION", "EPIC"]
+    entitlements = []
+    for i in range(count):
+        entitlement = {
+            "entitlementId": 1000000000000 + i,
+            "offerId": "Origin.OFR.50.{:07}".format(i),
+            "offerPath": "/battlefield/battlefield-{0}/standard-edition-{0}".format(i),
+            "status": "ACTIVE",
+            "offerType": offer_types[i % len(offer_types)],
+            "originDisplayType": "Full Game",
+            "masterTitleId": str(180000 + i),
+            "gameDistributionSubType": "Normal Game",
+            "grantDate": "2019-05-17T14:45:48Z",
+            "suppressedBy": [],
+            "suppressedOffers": [],
+            "isConsumable": False,
+            "productCatalog": "OFB",
+            "entitlementTag": "ORIGIN_DOWNLOAD",
+            "entitlementType": "ORIGIN_DOWNLOAD",
+            "version": 0,
+            "useCount": 0,
+            "entitlementSource": "ORIGIN-STORE-CLIENT-WIN",
+            "lastModifiedDate": "2020-04-01T13:23:00Z",
+            "projectId": str(300000 + i),
+            "cdKey": None,
+            "groupName": "PCWIN",
+            "updatedDate": "2020-04-01T13:23:00Z",
+        }
+        external_type = external_types[i % len(external_types)]
+        if external_type:
+            entitlement["externalType"] = external_type
+        entitlements.append(entitlement)
+    return json.dumps({"entitlements": entitlements}).encode("utf-8")
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entitlements", type=int, default=5000)
+    args = parser.parse_args()
+
+    payload = create_payload(args.entitlements)
+
+    def raw_dicts():
+        return json.loads(payload)["entitlements"]
+
+    async def iter_chunked(size):
+        for i in range(0, len(payload), size):
+            yield payload[i:i + size]
+
+    response = MagicMock()
+    response.content.iter_chunked = iter_chunked
+    http_client = MagicMock()
+
+    async def get(*args, **kwargs):
+        return response
+    http_client.get = get
+    backend_client = OriginBackendClient(http_client, PinnedHostSelector(["http://localhost"]))
+
+    loop = asyncio.new_event_loop()
+
+    def records(offer_type=None):
+        return loop.run_until_complete(backend_client.get_entitlements("1", offer_type))
+
+    print("payload: {:.1f} KiB, {} entitlements".format(len(payload) / 1024, args.entitlements))
+    print("{:<30} {:>8} {:>14} {:>12}".format("representation", "items", "retained KiB", "peak KiB"))
+    for name, function in [
+        ("raw dicts (json.loads)", raw_dicts),
+        ("Entitlement records", records),
+        ("Entitlement records, basegame", lambda: records("basegame")),
+    ]:
+        result, retained, peak = measure(function)
+        print("{:<30} {:>8} {:>14.1f} {:>12.1f}".format(name, len(result), retained / 1024, peak / 1024))
+        del result
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Throughput and failure rate of `OriginPlugin._get_offers` on a cold cache
+for different fetch concurrency limits, against a local fake supercat backend.
+
+Fake backend answers after `--latency` seconds and returns 503 when more than
+`--capacity` requests are in flight, like overloaded api[1-4].origin.com hosts do.
+
+    python benchmarks/offers_fetch.py --offers 1500 --limits 1 5 10 20 0
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from aiohttp import web  # noqa: E402
+
+from backend import AuthenticatedHttpClient, OriginBackendClient  # noqa: E402
+from host_routing import PinnedHostSelector  # noqa: E402
+from plugin import OriginPlugin  # noqa: E402
+
+
+class FakeBackend:
+    def __init__(self, latency, capacity):
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def get_offer(self, request):
+        self.in_flight += 1
+        try:
+            if self.in_flight > self.capacity:
+                self.rejected += 1
+                raise web.HTTPServiceUnavailable()
+            await asyncio.sleep(self.latency)
+            return web.json_response({
+                "offerId": request.match_info["offer_id"],
+                "masterTitleId": "1",
+                "i18n": {"displayName": "Game"},
+                "platforms": [{"platform": "PCWIN", "achievementSetOverride": None, "multiPlayerId": None}]
+            })
+        finally:
+            self.in_flight -= 1
+
+
+async def run(offers_count, limit, fake_backend, base_url):
+    http_client = AuthenticatedHttpClient(limit_per_host=0)  # connector limits only total connections
+    http_client._access_token = "token"
+
+    with patch("plugin.get_local_content_path", return_value=os.devnull):
+        plugin = OriginPlugin(MagicMock(), MagicMock(), None)
+    await plugin._http_client.close()
+    plugin._http_client = http_client
+    plugin._backend_client = OriginBackendClient(http_client, PinnedHostSelector([base_url]))
+    plugin._offers_fetch_concurrency = limit or offers_count
+    plugin.push_cache = MagicMock()
+
+    fake_backend.rejected = 0
+    offer_ids = ["Origin.OFR.50.{:07}".format(i) for i in range(offers_count)]
+    start = time.perf_counter()
+    try:
+        offers = await plugin._get_offers(offer_ids)
+    finally:
+        await http_client.close()
+    elapsed = time.perf_counter() - start
+
+    failed = offers_count - len(offers)
+    return elapsed, len(offers) / elapsed, failed / offers_count
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.02, help="backend latency in seconds")
+    parser.add_argument("--capacity", type=int, default=12, help="in-flight requests backend accepts")
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 5, 10, 20, 0], help="0 means unbounded")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # failed offers are expected
+
+    fake_backend = FakeBackend(args.latency, args.capacity)
+    app = web.Application()
+    app.router.add_get("/ecommerce2/public/supercat/{offer_id}/{locale}", fake_backend.get_offer)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = "http://127.0.0.1:{}".format(runner.addresses[0][1])
+
+    print("{:>9} {:>10} {:>14} {:>12}".format("limit", "time [s]", "offers/s", "failed [%]"))
+    try:
+        for limit in args.limits:
+            elapsed, throughput, failure_rate = await run(args.offers, limit, fake_backend, base_url)
+            print("{:>9} {:>10.2f} {:>14.1f} {:>12.1f}".format(
+                limit or "unbounded", elapsed, throughput, failure_rate * 100
+            ))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Plugin startup cost with a large persistent cache: `handshake_complete` and first access
+of decoded cache sections, for a cache of `--offers` offers and as many game times,
+stored in compact encoding and as json (like previous versions did).
+
+    python benchmarks/startup_cache.py --offers 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from galaxy.api.types import GameTime  # noqa: E402
+
+from backend import Offer  # noqa: E402
+from game_time_cache import GameTimeCache  # noqa: E402
+from offer_cache import CachedOffer, OfferCache  # noqa: E402
+from plugin import OFFER_CACHE_VERSION, OriginPlugin  # noqa: E402
+
+
+def create_persistent_cache(count: int, compact: bool):
+    offers = OfferCache()
+    game_times = GameTimeCache()
+    for i in range(count):
+        offer_id = "Origin.OFR.50.{:07}".format(i)
+        offers[offer_id] = CachedOffer(
+            Offer(
+                offer_id,
+                "Battlefield {} Standard Edition".format(i),
+                str(180000 + i),
+                "50563_{}_50844".format(180000 + i),
+                str(1024390 + i) if i % 3 == 0 else None,
+                "battlefield/battlefield-{0}/standard-edition-{0}".format(i)
+            ),
+            1600000000.5 + i
+        )
+        game_times[offer_id] = GameTime(offer_id, i % 5000, 1600000000 + i if i % 4 else None)
+    if not compact:
+        return {
+            "offers": json.dumps(offers),
+            "offers_version": OFFER_CACHE_VERSION,
+            "game_time": json.dumps({
+                game_id: {"game_id": game_time.game_id, "time_played": game_time.time_played}
+                if game_time.last_played_time is None else game_time.__dict__
+                for game_id, game_time in game_times.items()
+            }),
+            "lats": "1600000000",
+        }
+    return {
+        "offers": offers.encode(),
+        "offers_version": OFFER_CACHE_VERSION,
+        "game_time": game_times.encode(),
+        "lats": "1600000000",
+    }
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with patch("plugin.get_local_content_path", return_value=os.devnull):
+        plugin = OriginPlugin(MagicMock(), MagicMock(), None)
+    plugin.push_cache = MagicMock()
+
+    print("{} offers, {} game times".format(args.offers, args.offers))
+    print("{:<10} {:<42} {:>10}".format("encoding", "", "time [ms]"))
+    for encoding in ["json", "compact"]:
+        persistent_cache = create_persistent_cache(args.offers, compact=encoding == "compact")
+
+        def start():
+            plugin._initialize_cache(dict(persistent_cache))
+            plugin.handshake_complete()
+
+        def first_access():
+            start()
+            plugin._offer_id_cache
+            plugin._game_time_cache
+            plugin._failed_offers
+
+        def change_and_push():
+            plugin._game_time_cache["Origin.OFR.50.0000000"] = GameTime("Origin.OFR.50.0000000", 1, 1700000000)
+            plugin._cache_writer.mark_dirty()
+            plugin._cache_writer.flush()
+
+        def first_access_and_push():
+            first_access()
+            change_and_push()
+
+        size = sum(len(value) for value in persistent_cache.values())
+        print("{:<10} {:<42} {:>10.1f}".format(encoding, "persistent cache size [KiB]", size / 1024))
+        for name, function in [
+            ("handshake_complete", start),
+            ("handshake_complete + first access", first_access),
+            ("first access + push after a single change", first_access_and_push),
+            ("next push after a single change", change_and_push),
+        ]:
+            print("{:<10} {:<42} {:>10.2f}".format(encoding, name, measure(function, args.repeat) * 1000))
+
+    await plugin._http_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Time from authentication until the first sync has everything it needs: owned games,
+then game times, achievements and game library settings contexts requested one after another
+like Galaxy does, with and without prefetch started right after authentication.
+
+Fake backend answers after fixed latencies; Galaxy asks for owned games `--idle` seconds
+after authentication finishes.
+
+    python benchmarks/time_to_library.py --games 300 --idle 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from backend import Entitlement, Offer  # noqa: E402
+from plugin import OriginPlugin, PREFETCH_ENV  # noqa: E402
+
+
+class FakeBackend:
+    def __init__(self, games, latencies):
+        self.games = games
+        self.latencies = latencies
+        self.requests = 0
+
+    async def _respond(self, name, result):
+        self.requests += 1
+        await asyncio.sleep(self.latencies[name])
+        return result
+
+    async def get_identity(self):
+        return await self._respond("identity", ("1", "2", "user"))
+
+    async def get_entitlements(self, user_id, offer_type=None):
+        return await self._respond("entitlements", [
+            Entitlement("Origin.OFR.50.{:07}".format(i), "basegame") for i in range(self.games)
+        ])
+
+    async def get_offer(self, offer_id):
+        return await self._respond("offer", {
+            "offerId": offer_id,
+            "masterTitleId": offer_id[-7:],
+            "i18n": {"displayName": "Game"},
+            "platforms": [{"platform": "PCWIN", "achievementSetOverride": "50563_{}".format(offer_id[-7:])}]
+        })
+
+    async def get_lastplayed_games(self, user_id):
+        return await self._respond("lastplayed", {})
+
+    async def get_favorite_games(self, user_id):
+        return await self._respond("favorite", set())
+
+    async def get_hidden_games(self, user_id):
+        return await self._respond("hidden", set())
+
+    async def get_achievements(self, persona_id, achievement_set=None):
+        return await self._respond("achievements", {})
+
+
+async def run(prefetch, cached_offers, args, latencies):
+    os.environ[PREFETCH_ENV] = "1" if prefetch else "0"
+    with patch("plugin.get_local_content_path", return_value=os.devnull):
+        plugin = OriginPlugin(MagicMock(), MagicMock(), None)
+    await plugin._http_client.close()
+    plugin._http_client = MagicMock()
+    plugin._http_client.authenticate = MagicMock(side_effect=lambda cookies: asyncio.sleep(0))
+    plugin._http_client.is_authenticated.return_value = True
+    plugin._http_client.close = MagicMock(side_effect=lambda: asyncio.sleep(0))
+    backend = plugin._backend_client = FakeBackend(args.games, latencies)
+    plugin.push_cache = MagicMock()
+    plugin._initialize_cache({})
+    plugin.handshake_complete()
+    if cached_offers:
+        for i in range(args.games):
+            plugin._offer_id_cache.store(Offer("Origin.OFR.50.{:07}".format(i), "Game", str(i)))
+
+    start = time.perf_counter()
+    await plugin.authenticate({"cookies": {"cookie": "value"}})
+    await asyncio.sleep(args.idle)
+    game_ids = [game.game_id for game in await plugin.get_owned_games()]
+    await plugin.prepare_game_times_context(game_ids)
+    await plugin.prepare_achievements_context(game_ids)
+    await plugin.prepare_game_library_settings_context(game_ids)
+    elapsed = time.perf_counter() - start
+
+    plugin.close()
+    await plugin.wait_closed()
+    return elapsed, backend.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--idle", type=float, default=0.5, help="seconds until Galaxy asks for owned games")
+    parser.add_argument("--entitlements-latency", type=float, default=0.8)
+    parser.add_argument("--offer-latency", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.3, help="latency of other requests")
+    args = parser.parse_args()
+
+    latencies = {
+        "identity": args.latency,
+        "entitlements": args.entitlements_latency,
+        "offer": args.offer_latency,
+        "lastplayed": args.latency,
+        "favorite": args.latency,
+        "hidden": args.latency,
+        "achievements": args.latency * 2,
+    }
+
+    loop = asyncio.new_event_loop()
+    print("{} games, owned games requested {} s after authentication".format(args.games, args.idle))
+    print("{:<14} {:<10} {:>22} {:>10}".format("offer cache", "prefetch", "time to library [s]", "requests"))
+    for cached_offers in [False, True]:
+        for prefetch in [False, True]:
+            elapsed, requests = loop.run_until_complete(run(prefetch, cached_offers, args, latencies))
+            print("{:<14} {:<10} {:>22.2f} {:>10}".format(
+                "warm" if cached_offers else "cold", "on" if prefetch else "off", elapsed, requests
+            ))
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
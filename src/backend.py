@@ -1,28 +1,41 @@
+import asyncio
+import functools
 import logging
-import json
+import sys
 import time
-import random
 import xml.etree.ElementTree as ET
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from datetime import datetime
-from typing import Dict, List, NewType, Optional, Set, Any, Tuple
+from typing import Awaitable, Callable, Dict, List, NamedTuple, NewType, Optional, Set, Any, Tuple
 
 import aiohttp
 from galaxy.api.errors import (
     AccessDenied, AuthenticationRequired, BackendError, BackendNotAvailable, BackendTimeout, NetworkError,
-    UnknownBackendResponse
+    TooManyRequests, UnknownBackendResponse
 )
 from galaxy.api.types import Achievement, SubscriptionGame, Subscription
-from galaxy.http import HttpClient
+from galaxy.http import DEFAULT_LIMIT, DEFAULT_TIMEOUT, HttpClient, create_client_session, create_tcp_connector
 from yarl import URL
 
+from concurrency import HostTrafficControl, parse_retry_after
+from host_routing import endpoint_template, HedgingPolicy, LatencyAwareHostRouter
+from http_cache import HttpCache, MissingCacheEntry
+from json_stream import iter_array_items
+from retry import RetryPolicy
+
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+HOST_CONNECTION_LIMIT = 10
+ENTITLEMENTS_CHUNK_SIZE = 64 * 1024
+ACCESS_TOKEN_RENEWAL_MARGIN = 300  # seconds before expiration
+ACCESS_TOKEN_RENEWAL_RETRY_DELAY = 30
+SUPERCAT_LOCALE = "en_US"  # offers are public and the same for every user in a locale
 
 MasterTitleId = NewType("MasterTitleId", str)
 AchievementSet = NewType("AchievementSet", str)
+MultiplayerId = NewType("MultiplayerId", str)
 OfferId = NewType("OfferId", str)
 Timestamp = NewType("Timestamp", int)
 Json = Dict[str, Any]  # helper alias for general purpose
@@ -30,6 +43,100 @@ Json = Dict[str, Any]  # helper alias for general purpose
 SubscriptionDetails = namedtuple('SubscriptionDetails', ['tier', 'end_time'])
 
 
+class Entitlement(NamedTuple):
+    """Only the entitlement fields used by the plugin, out of dozens returned by backend"""
+    offer_id: OfferId
+    offer_type: str
+    external_type: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, data: Json) -> "Entitlement":
+        external_type = data.get("externalType")
+        # types repeat across all entitlements, so share the string objects
+        return cls(
+            OfferId(data["offerId"]),
+            sys.intern(data["offerType"]),
+            sys.intern(external_type) if external_type else None
+        )
+
+
+class Offer(NamedTuple):
+    """Only the offer fields used by the plugin, projected from the supercat document"""
+    offer_id: OfferId
+    display_name: str
+    master_title_id: Optional[MasterTitleId] = None
+    achievement_set: Optional[AchievementSet] = None
+    multiplayer_id: Optional[MultiplayerId] = None
+    gdp_path: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, data: Json) -> "Offer":
+        platforms = data.get("platforms") or []
+
+        # PCWIN achievement set takes precedence, otherwise the last platform's one is used
+        achievement_set = None
+        for platform in platforms:
+            achievement_set = platform.get("achievementSetOverride")
+            if platform.get("platform") == "PCWIN":
+                break
+
+        multiplayer_id = next(
+            (platform["multiPlayerId"] for platform in platforms if platform.get("multiPlayerId") is not None),
+            None
+        )
+
+        return cls(
+            OfferId(data["offerId"]),
+            data["i18n"]["displayName"],
+            data.get("masterTitleId"),
+            achievement_set,
+            multiplayer_id,
+            data.get("gdpPath")
+        )
+
+
+class _InFlightRequest:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+def coalesced(method):
+    """
+        Concurrent calls with the same arguments (so the same url and headers) share
+        one backend request and its parsed result.
+        The request is cancelled once all of its callers are cancelled.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        request = self._in_flight_requests.get(key)
+        if request is None:
+            request = self._in_flight_requests[key] = _InFlightRequest(
+                asyncio.ensure_future(method(self, *args, **kwargs))
+            )
+
+            def done(_task):
+                if self._in_flight_requests.get(key) is request:
+                    del self._in_flight_requests[key]
+                if not _task.cancelled():
+                    _task.exception()  # retrieved even if all callers were cancelled
+
+            request.task.add_done_callback(done)
+        request.waiters += 1
+        try:
+            # shielded, so cancelling one of the callers does not abort the others
+            return await asyncio.shield(request.task)
+        except asyncio.CancelledError:
+            if request.waiters == 1:
+                request.task.cancel()  # nobody else waits for the result
+            raise
+        finally:
+            request.waiters -= 1
+
+    return wrapper
+
+
 class CookieJar(aiohttp.CookieJar):
     def __init__(self):
         super().__init__()
@@ -44,14 +151,74 @@ class CookieJar(aiohttp.CookieJar):
             self._cookies_updated_callback(list(self))
 
 
-class AuthenticatedHttpClient(HttpClient):
+class ConnectionPoolStats:
+    """Counts connections opened and reused per host by aiohttp session"""
     def __init__(self):
+        self.opened: Dict[str, int] = defaultdict(int)
+        self.reused: Dict[str, int] = defaultdict(int)
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_start(session, trace_config_ctx, params):
+            trace_config_ctx.host = params.url.host
+
+        async def on_connection_create_end(session, trace_config_ctx, params):
+            self.opened[trace_config_ctx.host] += 1
+
+        async def on_connection_reuseconn(session, trace_config_ctx, params):
+            self.reused[trace_config_ctx.host] += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def as_dict(self) -> Dict[str, Dict[str, int]]:
+        return {
+            host: {"opened": self.opened.get(host, 0), "reused": self.reused.get(host, 0)}
+            for host in sorted(set(self.opened) | set(self.reused))
+        }
+
+
+class RequestTiming:
+    """
+        Filled by `AuthenticatedHttpClient.get`, so callers measure the backend instead of local queueing:
+        `sent` is set once the request leaves local queues (token refresh, concurrency limit, Retry-After pause),
+        `headers_latency` is the time from then until response headers came.
+    """
+    def __init__(self):
+        self.sent = asyncio.Event()
+        self.headers_latency: Optional[float] = None
+
+
+class AuthenticatedHttpClient(HttpClient):
+    def __init__(self, limit_per_host=HOST_CONNECTION_LIMIT):
         self._auth_lost_callback = None
         self._cookie_jar = CookieJar()
         self._access_token = None
         self._last_access_token_success = None
         self._save_lats_callback = None
-        super().__init__(cookie_jar=self._cookie_jar)
+        self._refresh_token_task = None
+        self._access_token_expiration = None
+        self._access_token_renewal_time = None
+        self._token_renewal_task = None
+        self._cached_access_token = None
+        self._cached_access_token_expiration = None
+        self._save_access_token_callback = None
+        self._pool_stats = ConnectionPoolStats()
+        self._http_cache = HttpCache()
+        self._traffic_control = HostTrafficControl(limit_per_host or DEFAULT_LIMIT)
+        # HttpClient.__init__ does not allow to pass trace configs
+        self._session = create_client_session(
+            connector=create_tcp_connector(limit=DEFAULT_LIMIT, limit_per_host=limit_per_host),
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+            cookie_jar=self._cookie_jar,
+            trace_configs=[self._pool_stats.create_trace_config()]
+        )
+
+    @property
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return self._pool_stats.as_dict()
 
     def set_auth_lost_callback(self, callback):
         self._auth_lost_callback = callback
@@ -61,31 +228,121 @@ class AuthenticatedHttpClient(HttpClient):
 
     async def authenticate(self, cookies):
         self._cookie_jar.update_cookies(cookies)
+        if self._use_cached_access_token():
+            # validated lazily - first request failing with 403 refreshes the token
+            return
         await self._get_access_token()
 
     def is_authenticated(self):
         return self._access_token is not None
 
-    async def get(self, *args, **kwargs):
+    async def close(self):
+        if self._token_renewal_task is not None:
+            self._token_renewal_task.cancel()
+        await super().close()
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        return {"hits": self._http_cache.hits, "bytes_saved": self._http_cache.bytes_saved}
+
+    def set_cache_scope(self, scope: Optional[str]):
+        """Responses are cached only within a scope (user) - when set"""
+        self._http_cache.set_scope(scope)
+
+    def set_cache_store(self, store):
+        """Keeps cached responses also in `store`, eg. `sqlite_store.SqliteHttpCacheStore`"""
+        self._http_cache.set_store(store)
+
+    async def get(self, *args, cache=False, timing: Optional[RequestTiming] = None, **kwargs):
+        """
+            :param cache - revalidate and reuse stored response; for endpoints returning validators only
+            :param timing - filled when the request is sent and its response headers come
+        """
         if not self._access_token:
             raise AccessDenied("No access token")
 
+        if self._access_token_expiration is not None and time.time() >= self._access_token_expiration:
+            # background renewal did not make it in time (e.g. system was suspended)
+            await self._refresh_token(self._access_token)
+
+        cache_key = self._http_cache.key(args[0], kwargs.get("params"), kwargs.get("headers")) if cache else None
+        conditional_headers = self._http_cache.conditional_headers(cache_key) if cache_key is not None else {}
+        if conditional_headers:
+            kwargs["headers"] = dict(kwargs.get("headers", {}), **conditional_headers)
+
+        access_token = self._access_token
         try:
-            return await self._authorized_get(*args, **kwargs)
+            response = await self._authorized_get(*args, timing=timing, **kwargs)
         except (AuthenticationRequired, AccessDenied):
             # Origin backend returns 403 when the auth token expires
-            await self._refresh_token()
-            return await self._authorized_get(*args, **kwargs)
+            await self._refresh_token(access_token)
+            response = await self._authorized_get(*args, timing=timing, **kwargs)
+
+        if cache_key is None:
+            return response
+        try:
+            response = await self._http_cache.handle_response(cache_key, response)
+        except MissingCacheEntry:
+            logger.info("Cached response of %s is gone, requesting it again", args[0])
+            for header in conditional_headers:
+                kwargs["headers"].pop(header, None)
+            try:
+                response = await self._http_cache.handle_response(
+                    cache_key, await self._authorized_get(*args, timing=timing, **kwargs)
+                )
+            except MissingCacheEntry:
+                raise UnknownBackendResponse("Not Modified response to unconditional request")
+        return response
 
-    async def _authorized_get(self, *args, **kwargs):
+    async def _authorized_get(self, *args, timing: Optional[RequestTiming] = None, **kwargs):
         headers = kwargs.setdefault("headers", {})
         headers["Authorization"] = "Bearer {}".format(self._access_token)
         headers["AuthToken"] = self._access_token
         headers["X-AuthToken"] = self._access_token
 
-        return await super().request("GET", *args, **kwargs)
+        # concurrency adapts to backend: grows while it keeps up, backs off on throttling or rising latency
+        host = URL(args[0]).host
+        limiter = self._traffic_control.limiter(host)
+        await limiter.acquire()
+        try:
+            await self._traffic_control.bucket(host).acquire()
+            if timing is not None:
+                timing.sent.set()
+            start = time.monotonic()
+            response = await super().request("GET", *args, **kwargs)
+        except (TooManyRequests, BackendNotAvailable) as e:
+            retry_after = parse_retry_after(e)
+            if retry_after:
+                logger.info("Backend asked to retry %s after %s seconds", host, retry_after)
+                self._traffic_control.bucket(host).pause(retry_after)
+            limiter.release(overloaded=True)
+            raise
+        except BaseException:
+            limiter.release()
+            raise
+        latency = time.monotonic() - start
+        if timing is not None:
+            timing.headers_latency = latency
+        limiter.release(latency)
+        return response
 
-    async def _refresh_token(self):
+    async def _refresh_token(self, expired_token):
+        """
+            Refresh is shared between all requests that failed with the same token,
+            so a burst of 403s results in a single request to accounts.ea.com.
+        """
+        if self._access_token != expired_token:
+            # already refreshed by a concurrent request
+            if not self._access_token:
+                raise AccessDenied("Failed to refresh token")
+            return
+
+        if self._refresh_token_task is None or self._refresh_token_task.done():
+            self._refresh_token_task = asyncio.ensure_future(self._do_refresh_token())
+        # shielded, so cancelling one of the waiting requests does not abort the others
+        await asyncio.shield(self._refresh_token_task)
+
+    async def _do_refresh_token(self):
         try:
             await self._get_access_token()
         except (BackendNotAvailable, BackendTimeout, BackendError, NetworkError):
@@ -94,6 +351,9 @@ class AuthenticatedHttpClient(HttpClient):
         except Exception:
             logger.exception("Failed to refresh token")
             self._access_token = None
+            self._access_token_expiration = None
+            self._access_token_renewal_time = None
+            self._save_access_token()
             if self._auth_lost_callback:
                 self._auth_lost_callback()
             raise AccessDenied("Failed to refresh token")
@@ -122,8 +382,83 @@ class AuthenticatedHttpClient(HttpClient):
                 logger.exception(f"Error parsing access token: {repr(e)}, data: {data}")
                 raise UnknownBackendResponse
         else:
+            self._set_access_token_expiration(data.get("expires_in"))
+            self._save_access_token()
             self._save_lats()
 
+    def _set_access_token_expiration(self, expires_in):
+        try:
+            expires_in = float(expires_in)
+        except (TypeError, ValueError):
+            logger.warning("Unknown access token lifetime: %s", expires_in)
+            self._access_token_expiration = None
+            self._access_token_renewal_time = None
+            return
+
+        now = time.time()
+        self._access_token_expiration = now + expires_in
+        self._access_token_renewal_time = now + max(expires_in - ACCESS_TOKEN_RENEWAL_MARGIN, expires_in / 2)
+        self._start_token_renewal()
+
+    def _start_token_renewal(self):
+        if self._token_renewal_task is None or self._token_renewal_task.done():
+            self._token_renewal_task = asyncio.ensure_future(self._renew_token_in_background())
+
+    async def _renew_token_in_background(self):
+        """
+            Renews access token shortly before it expires, so requests do not have to be replayed after 403.
+            Runs as long as the token lifetime is known.
+        """
+        while self._access_token_renewal_time is not None:
+            now = time.time()
+            if now < self._access_token_renewal_time:
+                # renewal time may be moved meanwhile by a refresh triggered by 403
+                await asyncio.sleep(self._access_token_renewal_time - now)
+                continue
+
+            try:
+                await self._refresh_token(self._access_token)
+            except (BackendNotAvailable, BackendTimeout, BackendError, NetworkError):
+                await asyncio.sleep(ACCESS_TOKEN_RENEWAL_RETRY_DELAY)
+            except AccessDenied:
+                # auth lost is already reported by _do_refresh_token
+                return
+
+    def _use_cached_access_token(self) -> bool:
+        access_token, expiration = self._cached_access_token, self._cached_access_token_expiration
+        self.forget_cached_access_token()  # single use
+
+        if not access_token or expiration is None:
+            return False
+        renewal_time = expiration - ACCESS_TOKEN_RENEWAL_MARGIN
+        if time.time() >= renewal_time:
+            return False
+
+        logger.info("Using cached access token")
+        self._access_token = access_token
+        self._access_token_expiration = expiration
+        self._access_token_renewal_time = renewal_time
+        self._start_token_renewal()
+        return True
+
+    def _save_access_token(self):
+        if self._save_access_token_callback is not None:
+            self._save_access_token_callback(self._access_token, self._access_token_expiration)
+
+    def set_save_access_token_callback(self, callback):
+        self._save_access_token_callback = callback
+
+    def load_access_token_from_cache(self, access_token: Optional[str], expiration: Optional[str]):
+        self._cached_access_token = access_token or None
+        try:
+            self._cached_access_token_expiration = float(expiration)
+        except (TypeError, ValueError):
+            self._cached_access_token_expiration = None
+
+    def forget_cached_access_token(self):
+        self._cached_access_token = None
+        self._cached_access_token_expiration = None
+
     # more logging for auth lost investigation
 
     def _save_lats(self):
@@ -152,23 +487,106 @@ class AuthenticatedHttpClient(HttpClient):
 
 
 class OriginBackendClient:
-    def __init__(self, http_client):
+    def __init__(
+        self,
+        http_client,
+        host_selector=None,
+        hedging_policy: Optional[HedgingPolicy] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
         self._http_client = http_client
-
-    @staticmethod
-    def _get_api_host():
-        return "https://api{}.origin.com".format(random.randint(1, 4))
-
+        self._host_selector = host_selector or LatencyAwareHostRouter()
+        self._hedging_policy = hedging_policy
+        self._retry_policy = retry_policy
+        self._in_flight_requests: Dict[Tuple, _InFlightRequest] = {}
+
+    def _get_api_host(self):
+        return self._host_selector.select()
+
+    async def _retrying(self, request: Callable[[], Awaitable[Any]]):
+        # all backend requests are idempotent GETs
+        if self._retry_policy is None:
+            return await request()
+        return await self._retry_policy.run(request)
+
+    async def _get(self, url, **kwargs):
+        return await self._retrying(lambda: self._request(url, **kwargs))
+
+    async def _get_api(self, path, hedged=False, **kwargs):
+        """Request to one of api[1-4] hosts, each attempt goes to the host currently selected by router"""
+        if hedged:
+            return await self._retrying(lambda: self._request_hedged(path, **kwargs))
+        return await self._retrying(lambda: self._request(self._get_api_host() + path, **kwargs))
+
+    async def _request(self, url, timing: Optional[RequestTiming] = None, **kwargs):
+        host = str(URL(url).origin())
+        # headers are extended with authorization by http client
+        kwargs = dict(kwargs, headers=dict(kwargs.get("headers", {}))) if "headers" in kwargs else kwargs
+        timing = timing or RequestTiming()
+        start = time.monotonic()
+        try:
+            response = await self._http_client.get(url, timing=timing, **kwargs)
+        except (BackendNotAvailable, BackendTimeout, NetworkError):
+            self._host_selector.report_failure(host)
+            raise
+        # until response headers, without waiting in local queues or reading body (eg. by http cache)
+        latency = timing.headers_latency
+        if latency is None:
+            latency = time.monotonic() - start  # not reported by http client
+        self._host_selector.report_success(host, latency)
+        if self._hedging_policy is not None:
+            self._hedging_policy.record(latency, endpoint_template(URL(url).path))
+        return response
+
+    async def _request_hedged(self, path, **kwargs):
+        """
+            If hedging is enabled and the response does not come within the policy delay after the request
+            was sent, the same request is sent to another api host.
+            The first successful response wins, the other request is cancelled.
+        """
+        host = self._get_api_host()
+        if self._hedging_policy is None:
+            return await self._request(host + path, **kwargs)
+
+        timing = RequestTiming()
+        primary = asyncio.ensure_future(self._request(host + path, timing=timing, **kwargs))
+        sent = asyncio.ensure_future(timing.sent.wait())
+        pending = {primary}
+        try:
+            # waiting in local queues (concurrency limit, Retry-After pause) is no reason to hedge
+            await asyncio.wait({primary, sent}, return_when=asyncio.FIRST_COMPLETED)
+            done, _ = await asyncio.wait(pending, timeout=self._hedging_policy.delay(endpoint_template(path)))
+            if done:
+                return primary.result()
+            alternative_host = self._host_selector.select_alternative(host)
+            if alternative_host is None:
+                return await primary
+
+            logger.debug("Hedging request %s to %s", path, alternative_host)
+            pending.add(asyncio.ensure_future(self._request(alternative_host + path, **kwargs)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    for task in done - {winner}:
+                        if task.exception() is None:
+                            task.result().release()
+                    return winner.result()
+            return primary.result()  # both failed
+        finally:
+            sent.cancel()
+            for task in pending:
+                task.cancel()
+
+    @coalesced
     async def get_identity(self) -> Tuple[str, str, str]:
-        pid_response = await self._http_client.get(
+        pid_response = await self._get(
             "https://gateway.ea.com/proxy/identity/pids/me"
         )
         data = await pid_response.json()
         user_id = data["pid"]["pidId"]
 
-        persona_id_response = await self._http_client.get(
-            "{}/atom/users?userIds={}".format(self._get_api_host(), user_id)
-        )
+        persona_id_response = await self._get_api("/atom/users?userIds={}".format(user_id))
         content = await persona_id_response.text()
 
         try:
@@ -181,40 +599,45 @@ class OriginBackendClient:
             logger.exception("Can not parse backend response: %s, error %s", content, repr(e))
             raise UnknownBackendResponse()
 
-    async def get_entitlements(self, user_id) -> List[Json]:
-        url = "{}/ecommerce2/consolidatedentitlements/{}?machine_hash=1".format(
-            self._get_api_host(),
-            user_id
-        )
+    @coalesced
+    async def get_entitlements(self, user_id, offer_type: Optional[str] = None) -> List[Entitlement]:
+        """
+            :param offer_type - if given, only entitlements of this type are returned (e.g. "basegame")
+        """
+        path = "/ecommerce2/consolidatedentitlements/{}?machine_hash=1".format(user_id)
         headers = {
             "Accept": "application/vnd.origin.v3+json; x-cache/force-write"
         }
-        response = await self._http_client.get(url, headers=headers)
+        response = await self._get_api(path, hedged=True, cache=True, headers=headers)
         try:
-            data = await response.json()
-            logger.debug(json.dumps(data))
-            return data["entitlements"]
-        except (ValueError, KeyError) as e:
-            logger.exception("Can not parse backend response: %s, error %s", await response.text(), repr(e))
+            # payload of large libraries takes megabytes - parsed one entitlement at a time
+            chunks = response.content.iter_chunked(ENTITLEMENTS_CHUNK_SIZE)
+            entitlements = [
+                Entitlement.from_json(entitlement)
+                async for entitlement in iter_array_items(chunks, "entitlements")
+                if offer_type is None or entitlement["offerType"] == offer_type
+            ]
+            logger.debug("Got %d entitlements of type %s", len(entitlements), offer_type)
+            return entitlements
+        except (ValueError, KeyError, TypeError) as e:
+            logger.exception("Can not parse entitlements from backend response, error %s", repr(e))
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_offer(self, offer_id) -> Json:
-        url = "{}/ecommerce2/public/supercat/{}/{}".format(
-            self._get_api_host(),
-            offer_id,
-            "en_US"
-        )
-        response = await self._http_client.get(url)
+        path = "/ecommerce2/public/supercat/{}/{}".format(offer_id, SUPERCAT_LOCALE)
+        response = await self._get_api(path, hedged=True)
         try:
             return await response.json()
         except ValueError as e:
             logger.exception("Can not parse backend response: %s, error %s", await response.text, repr(e))
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_achievements(self, persona_id: str, achievement_set: str = None) \
             -> Dict[AchievementSet, List[Achievement]]:
 
-        response = await self._http_client.get(
+        response = await self._get(
             "https://achievements.gameservices.ea.com/achievements/personas/{persona_id}{ach_set}/all".format(
                 persona_id=persona_id, ach_set=("/" + achievement_set) if achievement_set else ""
             ),
@@ -257,19 +680,16 @@ class OriginBackendClient:
             logger.exception("Can not parse achievements from backend response %s", repr(e))
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_game_time(self, user_id, master_title_id, multiplayer_id):
-        url = "{}/atom/users/{}/games/{}/usage".format(
-            self._get_api_host(),
-            user_id,
-            master_title_id
-        )
+        path = "/atom/users/{}/games/{}/usage".format(user_id, master_title_id)
 
         # 'multiPlayerId' must be used if exists, otherwise '**/lastplayed' backend returns zero
         headers = {}
         if multiplayer_id:
             headers["Multiplayerid"] = multiplayer_id
 
-        response = await self._http_client.get(url, headers=headers)
+        response = await self._get_api(path, hedged=True, headers=headers)
 
         """
         response looks like following:
@@ -297,14 +717,15 @@ class OriginBackendClient:
             logger.exception("Can not parse backend response: %s, %s", await response.text(), repr(e))
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_friends(self, user_id):
-        response = await self._http_client.get(
-            "{base_api}/atom/users/{user_id}/other/{other_user_id}/friends?page={page}".format(
-                base_api=self._get_api_host(),
+        response = await self._get_api(
+            "/atom/users/{user_id}/other/{other_user_id}/friends?page={page}".format(
                 user_id=user_id,
                 other_user_id=user_id,
                 page=0
-            )
+            ),
+            cache=True
         )
 
         """
@@ -332,11 +753,11 @@ class OriginBackendClient:
             logger.exception("Can not parse backend response: %s", await response.text())
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_lastplayed_games(self, user_id) -> Dict[MasterTitleId, Timestamp]:
-        response = await self._http_client.get("{base_api}/atom/users/{user_id}/games/lastplayed".format(
-            base_api=self._get_api_host(),
-            user_id=user_id
-        ))
+        response = await self._get_api(
+            "/atom/users/{user_id}/games/lastplayed".format(user_id=user_id), hedged=True, cache=True
+        )
 
         '''
         <?xml version="1.0" encoding="UTF-8" standalone="yes"?>
@@ -375,11 +796,11 @@ class OriginBackendClient:
             logger.exception("Can not parse backend response: %s", await response.text())
             raise UnknownBackendResponse(e)
 
+    @coalesced
     async def get_favorite_games(self, user_id) -> Set[OfferId]:
-        response = await self._http_client.get("{base_api}/atom/users/{user_id}/privacySettings/FAVORITEGAMES".format(
-            base_api=self._get_api_host(),
+        response = await self._get_api("/atom/users/{user_id}/privacySettings/FAVORITEGAMES".format(
             user_id=user_id
-        ))
+        ), cache=True)
 
         '''
         <?xml version="1.0" encoding="UTF-8"?>
@@ -406,11 +827,11 @@ class OriginBackendClient:
             logger.exception("Can not parse backend response: %s", await response.text())
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_hidden_games(self, user_id) -> Set[OfferId]:
-        response = await self._http_client.get("{base_api}/atom/users/{user_id}/privacySettings/HIDDENGAMES".format(
-            base_api=self._get_api_host(),
+        response = await self._get_api("/atom/users/{user_id}/privacySettings/HIDDENGAMES".format(
             user_id=user_id
-        ))
+        ), cache=True)
 
         '''
         <?xml version="1.0" encoding="UTF-8"?>
@@ -449,7 +870,7 @@ class OriginBackendClient:
             return Timestamp(
                 int((datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S") - datetime(1970, 1, 1)).total_seconds()))
 
-        response = await self._http_client.get(subscription_uri)
+        response = await self._get(subscription_uri)
         try:
             data = await response.json()
             sub_status = self._get_subscription_status(data)
@@ -467,7 +888,7 @@ class OriginBackendClient:
 
     async def _get_subscription_uris(self, user_id) -> List[str]:
         url = f"https://gateway.ea.com/proxy/subscription/pids/{user_id}/subscriptionsv2/groups/Origin Membership"
-        response = await self._http_client.get(url)
+        response = await self._get(url)
         try:
             data = await response.json()
             return [
@@ -478,6 +899,7 @@ class OriginBackendClient:
             logger.exception("Can not parse backend response while getting subs uri: %s, error %s", await response.text(), repr(e))
             raise UnknownBackendResponse()
 
+    @coalesced
     async def get_subscriptions(self, user_id) -> List[Subscription]:
         subs = {'standard': Subscription(subscription_name='EA Play', owned=False),
                 'premium': Subscription(subscription_name='EA Play Pro', owned=False)}
@@ -497,15 +919,16 @@ class OriginBackendClient:
             raise UnknownBackendResponse()
         return [subs['standard'], subs['premium']]
 
+    @coalesced
     async def get_games_in_subscription(self, tier) -> List[SubscriptionGame]:
         """
             Note: `game_id` of an returned subscription game may not match with `game_id` of the game added to user library!
         """
-        url = f"{self._get_api_host()}/ecommerce2/vaultInfo/Origin Membership/tiers/{tier}"
+        path = f"/ecommerce2/vaultInfo/Origin Membership/tiers/{tier}"
         headers = {
             "Accept": "application/vnd.origin.v3+json; x-cache/force-write"
         }
-        response = await self._http_client.get(url, headers=headers)
+        response = await self._get_api(path, cache=True, headers=headers)
         try:
             games = await response.json()
             subscription_suffix = '@subscription'  # externalType for compatibility with owned games interface
@@ -0,0 +1,28 @@
+"""
+Compact encoding of persistent cache sections: zlib compressed JSON, base64 encoded
+so it still fits Galaxy's string-valued persistent cache. The prefix tells it apart
+from sections stored as plain JSON by previous versions.
+"""
+import base64
+import json
+import zlib
+from typing import Any
+
+
+COMPACT_PREFIX = "z1:"
+COMPRESSION_LEVEL = 6
+
+
+def is_compact(encoded: str) -> bool:
+    return encoded.startswith(COMPACT_PREFIX)
+
+
+def pack(data: Any) -> str:
+    raw = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return COMPACT_PREFIX + base64.b64encode(zlib.compress(raw, COMPRESSION_LEVEL)).decode("ascii")
+
+
+def unpack(encoded: str) -> Any:
+    if not is_compact(encoded):
+        raise ValueError("Not a compact cache section")
+    return json.loads(zlib.decompress(base64.b64decode(encoded[len(COMPACT_PREFIX):])))
@@ -0,0 +1,116 @@
+import asyncio
+import dataclasses
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_PUSH_DELAY = 5  # seconds
+
+
+def _encode_dataclass(o: Any) -> Any:
+    # the same as galaxy api encoder
+    if dataclasses.is_dataclass(o):
+        # shallow, cache entries hold only plain fields
+        values = ((field.name, getattr(o, field.name)) for field in dataclasses.fields(o))
+        return {name: value for name, value in values if value is not None}
+    raise TypeError("Object of type {} is not JSON serializable".format(type(o).__name__))
+
+
+_encoder = json.JSONEncoder(default=_encode_dataclass, ensure_ascii=False)
+
+
+class CacheSection(dict):
+    """
+        Persistent cache section (JSON object of entries) remembering which entries changed,
+        so only those are encoded again. `encoded` is the already encoded content, eg. read from cache.
+        Only `[]=`, `del` and `pop` are tracked.
+        Subclasses may encode the whole section in another format by overriding `_encode`.
+    """
+    track_entries = True
+
+    def __init__(self, entries: Iterable = (), encoded: Optional[str] = None):
+        super().__init__(entries)
+        self._encoded = encoded
+        self._encoded_entries: Dict[str, str] = {}
+        self._changed_keys: Set[str] = set()
+
+    @property
+    def changed(self) -> bool:
+        return self._encoded is None
+
+    def mark_changed(self, key: Optional[str] = None):
+        if key is not None and self.track_entries:
+            self._changed_keys.add(key)
+        self._encoded = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.mark_changed(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.mark_changed(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self.mark_changed(key)
+        return super().pop(key, *default)
+
+    def encode(self) -> str:
+        if self._encoded is None:
+            self._encoded = self._encode()
+        return self._encoded
+
+    def _encode(self) -> str:
+        for key in self._changed_keys:
+            self._encoded_entries.pop(key, None)
+        self._changed_keys.clear()
+        encoded_entries = self._encoded_entries
+        for key, value in self.items():
+            if key not in encoded_entries:
+                encoded_entries[key] = _encoder.encode(value)
+        return "{" + ",".join(_encoder.encode(key) + ":" + encoded_entries[key] for key in self) + "}"
+
+
+class CacheWriter:
+    """
+        Coalesces persistent cache pushes: changes only mark the cache dirty and it is pushed
+        at most once per `delay`, or right away on `flush`.
+    """
+    def __init__(self, push: Callable[[], None], delay: float = CACHE_PUSH_DELAY):
+        self._push = push
+        self._delay = delay
+        self._dirty = False
+        self._pending_flush: Optional[asyncio.TimerHandle] = None
+        self.pushes = 0
+        self.coalesced = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self):
+        if self._dirty:
+            self.coalesced += 1
+        self._dirty = True
+        if self._pending_flush is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no loop yet (eg. during handshake), pushed with the next flush
+            return
+        self._pending_flush = loop.call_later(self._delay, self.flush)
+
+    def flush(self):
+        if self._pending_flush is not None:
+            self._pending_flush.cancel()
+            self._pending_flush = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        self.pushes += 1
+        self._push()
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional
+
+import aiohttp
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """
+        Seconds to wait from `Retry-After` header of the response which caused `error`.
+        galaxy.http translates aiohttp errors, so the original one is available as exception context.
+    """
+    context = error.__context__
+    if not isinstance(context, aiohttp.ClientResponseError) or not context.headers:
+        return None
+    value = context.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        logger.warning("Unknown Retry-After value: %s", value)
+        return None
+
+
+class TokenBucket:
+    """
+        Limits request rate to `rate` per second with bursts up to `capacity`. Can be paused on Retry-After.
+        Without `rate` only pauses are enforced.
+    """
+    def __init__(self, rate: Optional[float] = None, capacity: float = 1):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float):
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated_at = max(self._updated_at, self._paused_until)
+
+    async def acquire(self):
+        if self._rate is None:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        while True:
+            now = time.monotonic()
+            if now >= self._updated_at:
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return
+            wait = max(self._paused_until - now, (1 - self._tokens) / self._rate)
+            await asyncio.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+        AIMD concurrency limit: grows by one per `limit` successful requests while latency is stable,
+        is multiplied by `decrease_factor` on overload (429/503) or when smoothed latency exceeds
+        `latency_tolerance` times the lowest latency observed recently. Decreases at most once per
+        smoothed latency period, so a single burst of errors does not collapse the limit.
+    """
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 10,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        baseline_window: int = 100
+    ):
+        self.limit = float(initial_limit)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._decrease_factor = decrease_factor
+        self._latency_tolerance = latency_tolerance
+        self._smoothing = smoothing
+        self._baseline: Deque[float] = deque(maxlen=baseline_window)
+        self._latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self):
+        if self._in_flight < int(self.limit) and not self._waiters:
+            self._in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # slot was already handed over
+                self._in_flight -= 1
+                self._wake_up_waiters()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        """:param latency - of successful request, None if request failed for unrelated reason"""
+        self._in_flight -= 1
+        if overloaded:
+            self._decrease("backend overloaded")
+        elif latency is not None:
+            self._record_latency(latency)
+        self._wake_up_waiters()
+
+    def _record_latency(self, latency: float):
+        self._baseline.append(latency)
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += self._smoothing * (latency - self._latency)
+
+        if self._latency > min(self._baseline) * self._latency_tolerance:
+            self._decrease("latency rising")
+        else:
+            self.limit = min(self._max_limit, self.limit + 1 / self.limit)
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self._min_limit, self.limit * self._decrease_factor)
+        logger.debug("Concurrency limit decreased to %.1f: %s", self.limit, reason)
+
+    def _wake_up_waiters(self):
+        while self._waiters and self._in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+
+class HostTrafficControl:
+    """
+        Adaptive concurrency limiter and request rate bucket per host.
+        Request rate is not limited unless `rate` is given, buckets then only honor Retry-After pauses.
+    """
+    def __init__(self, max_concurrency: int, rate: Optional[float] = None, burst: float = 1):
+        self._max_concurrency = max_concurrency
+        self._rate = rate
+        self._burst = burst
+        self._limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def limiter(self, host: str) -> AdaptiveConcurrencyLimiter:
+        if host not in self._limiters:
+            self._limiters[host] = AdaptiveConcurrencyLimiter(max_limit=self._max_concurrency)
+        return self._limiters[host]
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self._rate, self._burst)
+        return self._buckets[host]
@@ -0,0 +1,36 @@
+from galaxy.api.types import GameTime
+
+from cache_codec import pack, unpack
+from cache_writer import CacheSection
+
+
+class GameTimeCache(CacheSection):
+    """Game times by game id, encoded compactly as columns instead of objects repeating field names"""
+    track_entries = False
+
+    def _encode(self) -> str:
+        game_times = list(self.values())
+        return pack({
+            "game_id": list(self),
+            # game time id differs from its key only for entries cached before offerId -> gameId migration
+            "aliases": {
+                str(i): game_time.game_id
+                for i, (game_id, game_time) in enumerate(self.items())
+                if game_time.game_id != game_id
+            },
+            "time_played": [game_time.time_played for game_time in game_times],
+            "last_played_time": [game_time.last_played_time for game_time in game_times]
+        })
+
+    @classmethod
+    def from_compact(cls, encoded: str) -> "GameTimeCache":
+        data = unpack(encoded)
+        aliases = data["aliases"]
+        return cls(
+            (
+                (game_id, GameTime(aliases.get(str(i), game_id), time_played, last_played_time))
+                for i, (game_id, time_played, last_played_time)
+                in enumerate(zip(data["game_id"], data["time_played"], data["last_played_time"]))
+            ),
+            encoded=encoded
+        )
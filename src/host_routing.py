@@ -0,0 +1,240 @@
+import enum
+import logging
+import math
+import random
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+
+API_HOSTS = ["https://api{}.origin.com".format(i) for i in range(1, 5)]
+
+_ID_SEGMENT_RE = re.compile(r"\d")
+_NAME_SEGMENT_RE = re.compile(r"^[A-Za-z]+\d*$")  # eg. ecommerce2
+
+
+def endpoint_template(path: str) -> str:
+    """Path with id segments replaced, eg. `/atom/users/{}/games/lastplayed`; the same for every api host"""
+    path = path.split("?", 1)[0]
+    return "/".join(
+        "{}" if _ID_SEGMENT_RE.search(segment) and not _NAME_SEGMENT_RE.match(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+class PinnedHostSelector:
+    """
+        Sticks to a single api host as long as it works, so keep-alive connections and TLS sessions
+        of the shared http session are reused. Switches to the next host when the current one fails.
+    """
+    def __init__(self, hosts: Sequence[str] = API_HOSTS):
+        self._hosts = list(hosts)
+        # random starting point spreads users between hosts
+        self._current = random.randrange(len(self._hosts))
+
+    def select(self) -> str:
+        return self._hosts[self._current]
+
+    def select_alternative(self, host: str) -> Optional[str]:
+        others = [h for h in self._hosts if h != host]
+        return random.choice(others) if others else None
+
+    def report_success(self, host: str, latency: float):
+        pass
+
+    def report_failure(self, host: str):
+        if host != self.select():
+            # unknown host or already switched by a concurrent request
+            return
+        self._current = (self._current + 1) % len(self._hosts)
+        logger.info("Api host %s failed, switching to %s", host, self.select())
+
+
+class CircuitState(enum.Enum):
+    Closed = "closed"
+    Open = "open"
+    HalfOpen = "half-open"
+
+
+class CircuitBreaker:
+    """
+        Opens after `failure_threshold` consecutive failures. After `reset_timeout` seconds
+        a single probe request is let through - its success closes the circuit, failure opens it again.
+    """
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._changed_at = 0.0
+        self.state = CircuitState.Closed
+
+    def ready_for_probe(self, now: float) -> bool:
+        # half-open probe which never reported back is retried after timeout as well
+        return self.state != CircuitState.Closed and now >= self._changed_at + self._reset_timeout
+
+    def start_probe(self, now: float):
+        self.state = CircuitState.HalfOpen
+        self._changed_at = now
+
+    def record_success(self):
+        self._failures = 0
+        self.state = CircuitState.Closed
+
+    def record_failure(self, now: float):
+        self._failures += 1
+        if self.state == CircuitState.HalfOpen or self._failures >= self._failure_threshold:
+            self.state = CircuitState.Open
+            self._changed_at = now
+
+
+class HostStats:
+    def __init__(self, smoothing: float):
+        self._smoothing = smoothing
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+
+    def record_success(self, latency: float):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self._smoothing * (latency - self.latency)
+        self.error_rate -= self._smoothing * self.error_rate
+
+    def record_failure(self):
+        self.error_rate += self._smoothing * (1 - self.error_rate)
+
+    def score(self) -> float:
+        return self.latency * (1 + 4 * self.error_rate)
+
+
+class LatencyAwareHostRouter:
+    """
+        Routes requests to the fastest healthy api host, tracking rolling (exponentially weighted)
+        latency and error rate per host. Host with open circuit gets no traffic until a probe succeeds.
+        Stays on current host unless another one is clearly faster, to keep connections reused.
+        Small share of requests explores other hosts to keep their statistics up to date.
+    """
+    def __init__(
+        self,
+        hosts: Sequence[str] = API_HOSTS,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        smoothing: float = 0.2,
+        switch_ratio: float = 1.5,
+        exploration_rate: float = 0.05
+    ):
+        self._hosts = list(hosts)
+        self._breakers: Dict[str, CircuitBreaker] = {
+            host: CircuitBreaker(failure_threshold, reset_timeout) for host in self._hosts
+        }
+        self._stats: Dict[str, HostStats] = {host: HostStats(smoothing) for host in self._hosts}
+        self._switch_ratio = switch_ratio
+        self._exploration_rate = exploration_rate
+        # random starting point spreads users between hosts
+        self._current = random.choice(self._hosts)
+
+    def circuit_state(self, host: str) -> CircuitState:
+        return self._breakers[host].state
+
+    def latency(self, host: str) -> Optional[float]:
+        return self._stats[host].latency
+
+    def select(self) -> str:
+        now = time.monotonic()
+        for host in self._hosts:
+            if self._breakers[host].ready_for_probe(now):
+                self._breakers[host].start_probe(now)
+                logger.info("Probing api host %s", host)
+                return host
+
+        healthy = [host for host in self._hosts if self._breakers[host].state == CircuitState.Closed]
+        if not healthy:
+            # nothing better available, let the request fail or succeed on its own
+            return self._current
+
+        others = [host for host in healthy if host != self._current]
+        if others and random.random() < self._exploration_rate:
+            return random.choice(others)
+
+        measured = [host for host in healthy if self._stats[host].latency is not None]
+        if self._current not in healthy:
+            self._switch(min(measured, key=self._score) if measured else random.choice(healthy))
+        elif self._stats[self._current].latency is not None and measured:
+            fastest = min(measured, key=self._score)
+            if self._score(fastest) * self._switch_ratio < self._score(self._current):
+                self._switch(fastest)
+        return self._current
+
+    def select_alternative(self, host: str) -> Optional[str]:
+        """Fastest healthy host other than `host`, used for hedged requests"""
+        others = [
+            h for h in self._hosts
+            if h != host and self._breakers[h].state == CircuitState.Closed
+        ]
+        if not others:
+            return None
+        measured = [h for h in others if self._stats[h].latency is not None]
+        return min(measured, key=self._score) if measured else random.choice(others)
+
+    def report_success(self, host: str, latency: float):
+        if host not in self._breakers:
+            return
+        self._breakers[host].record_success()
+        self._stats[host].record_success(latency)
+
+    def report_failure(self, host: str):
+        if host not in self._breakers:
+            return
+        breaker = self._breakers[host]
+        breaker.record_failure(time.monotonic())
+        self._stats[host].record_failure()
+        if breaker.state == CircuitState.Open:
+            logger.warning("Circuit opened for api host %s", host)
+
+    def _score(self, host: str) -> float:
+        return self._stats[host].score()
+
+    def _switch(self, host: str):
+        logger.info("Switching api host from %s to %s", self._current, host)
+        self._current = host
+
+
+class HedgingPolicy:
+    """
+        Delay after which a hedged (duplicate) request is sent - given percentile of recently
+        observed latencies, bounded to `[min_delay, max_delay]`.
+        Latencies are kept per endpoint, so small documents do not set the delay of large ones.
+    """
+    def __init__(
+        self,
+        percentile: float = 95,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_delay: float = 5.0,
+        window: int = 200,
+        min_samples: int = 20
+    ):
+        self._percentile = percentile
+        self._initial_delay = initial_delay
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._min_samples = min_samples
+        self._window = window
+        self._latencies: Dict[Hashable, Deque[float]] = {}
+
+    def record(self, latency: float, endpoint: Hashable = None):
+        if endpoint not in self._latencies:
+            self._latencies[endpoint] = deque(maxlen=self._window)
+        self._latencies[endpoint].append(latency)
+
+    def delay(self, endpoint: Hashable = None) -> float:
+        latencies = self._latencies.get(endpoint, ())
+        if len(latencies) < self._min_samples:
+            return self._initial_delay
+        latencies = sorted(latencies)
+        index = min(len(latencies) - 1, math.ceil(self._percentile / 100 * len(latencies)) - 1)
+        return min(self._max_delay, max(self._min_delay, latencies[index]))
@@ -0,0 +1,169 @@
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Hashable, NamedTuple, Optional
+
+from yarl import URL
+
+
+logger = logging.getLogger(__name__)
+
+
+_API_HOST_RE = re.compile(r"^api\d+\.origin\.com$")
+
+
+class CacheEntry(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    content_type: str
+    charset: Optional[str]
+
+
+class MissingCacheEntry(Exception):
+    """304 Not Modified came for an entry which is not stored anymore, the request has to be sent without validators"""
+
+
+class BufferedContent:
+    """Minimal `aiohttp.StreamReader` interface over already read body"""
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        for i in range(0, len(self._body), n):
+            yield self._body[i:i + n]
+
+
+class BufferedResponse:
+    """Stands for aiohttp response which body was read by cache, or was served from cache on 304"""
+    status = 200
+
+    def __init__(self, entry: CacheEntry):
+        self._entry = entry
+        self.content_type = entry.content_type
+        self.charset = entry.charset
+        self.content = BufferedContent(entry.body)
+
+    async def read(self) -> bytes:
+        return self._entry.body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        return self._entry.body.decode(encoding or self.charset or "utf-8")
+
+    async def json(self, *, encoding: Optional[str] = None, loads=json.loads, content_type: Optional[str] = None) -> Any:
+        return loads(await self.text(encoding))
+
+    def release(self):
+        pass
+
+
+class HttpCache:
+    """
+        Stores bodies of responses having validators (`ETag`, `Last-Modified`) and revalidates them
+        with `If-None-Match`/`If-Modified-Since`. On 304 Not Modified the stored body is served.
+
+        Entries are kept per scope (user), so data of one user is never served to another.
+        Api hosts api[1-4].origin.com serve the same content, so they share entries.
+        Least recently used entries are evicted when stored bodies exceed `max_size` bytes.
+        A backing store (`get`, `put`, `delete` by key, eg. `sqlite_store.SqliteHttpCacheStore`)
+        is consulted on misses, so entries also outlive the plugin process.
+    """
+    def __init__(self, max_size: int = 32 * 1024 * 1024):
+        self._max_size = max_size
+        self._size = 0
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._scope: Optional[str] = None
+        self._store_backend: Optional[Any] = None
+        self.hits = 0
+        self.bytes_saved = 0
+
+    def set_scope(self, scope: Optional[str]):
+        if scope != self._scope:
+            self.clear()
+        self._scope = scope
+
+    def set_store(self, store: Optional[Any]):
+        self._store_backend = store
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def key(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> Optional[Hashable]:
+        """None if responses should not be cached"""
+        if self._scope is None:
+            return None
+        url = URL(url)
+        if url.host and _API_HOST_RE.match(url.host):
+            url = url.with_host("api.origin.com")
+        return (
+            self._scope,
+            str(url),
+            tuple(sorted((params or {}).items())),
+            tuple(sorted((headers or {}).items()))
+        )
+
+    def _get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None and self._store_backend is not None:
+            entry = self._store_backend.get(key)
+            if entry is not None:
+                self._add(key, entry)
+        return entry
+
+    def conditional_headers(self, key: Hashable) -> Dict[str, str]:
+        entry = self._get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    async def handle_response(self, key: Hashable, response):
+        entry = self._get(key)
+        if response.status == 304 and entry is not None:
+            response.release()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(entry.body)
+            return BufferedResponse(entry)
+        if response.status == 304:
+            # evicted, or removed by another response, while being revalidated; the empty body is never stored
+            response.release()
+            raise MissingCacheEntry(key)
+
+        body = await response.read()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        entry = CacheEntry(etag, last_modified, body, response.content_type, response.charset)
+        if (etag or last_modified) and "no-store" not in response.headers.get("Cache-Control", ""):
+            self._store(key, entry)
+        else:
+            self._remove(key)
+        return BufferedResponse(entry)
+
+    def _store(self, key: Hashable, entry: CacheEntry):
+        self._remove(key)
+        if len(entry.body) > self._max_size:
+            return
+        if self._store_backend is not None:
+            self._store_backend.put(key, entry)
+        self._add(key, entry)
+
+    def _add(self, key: Hashable, entry: CacheEntry):
+        self._entries[key] = entry
+        self._size += len(entry.body)
+        while self._size > self._max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+
+    def _remove(self, key: Hashable):
+        if self._store_backend is not None:
+            self._store_backend.delete(key)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.body)
@@ -0,0 +1,64 @@
+import codecs
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator
+
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+async def iter_array_items(chunks: AsyncIterable[bytes], key: str) -> AsyncIterator[Any]:
+    """
+        Yields items of array of objects stored under `key` of a JSON document, one at a time,
+        as the document chunks arrive - the whole document is never built in memory.
+        Raises `KeyError` when the key is not found and `ValueError` on malformed document.
+    """
+    key_re = re.compile(r'"{}"\s*:\s*\['.format(re.escape(key)))
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = chunks.__aiter__()
+    buffer = ""
+    eof = False
+
+    async def read_more() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        try:
+            buffer += utf8.decode(await chunks.__anext__())
+        except StopAsyncIteration:
+            buffer += utf8.decode(b"", final=True)
+            eof = True
+        return True
+
+    # find beginning of the array
+    while True:
+        match = key_re.search(buffer)
+        if match is not None:
+            buffer = buffer[match.end():]
+            break
+        # keep the tail, key may be split between chunks
+        buffer = buffer[-(len(key) + 16):]
+        if not await read_more():
+            raise KeyError(key)
+
+    while True:
+        position = 0
+        while position < len(buffer) and buffer[position] in _WHITESPACE + ",":
+            position += 1
+        buffer = buffer[position:]
+        if not buffer:
+            if not await read_more():
+                raise ValueError("Unexpected end of document")
+            continue
+        if buffer[0] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # item not complete yet
+            if not await read_more():
+                raise
+            continue
+        buffer = buffer[end:]
+        yield item
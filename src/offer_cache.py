@@ -0,0 +1,116 @@
+import time
+from typing import Iterable, NamedTuple, Optional, Set
+
+from backend import Offer, OfferId
+from cache_codec import pack, unpack
+from cache_writer import CacheSection
+
+
+OFFER_TTL = 3 * 24 * 60 * 60  # seconds
+OFFER_CACHE_MAX_SIZE = 2000
+OFFER_RETRY_DELAY = 60 * 60  # seconds, doubled with every consecutive failure
+OFFER_MAX_RETRY_DELAY = 7 * 24 * 60 * 60
+
+
+class CachedOffer(NamedTuple):
+    offer: Offer
+    fetched_at: float  # unix time, 0 when unknown
+
+
+class OfferCache(CacheSection):
+    """
+        Offers by id with the time they were fetched, least recently used first.
+        Encoded compactly as columns of offer fields, without repeating offer ids as keys.
+    """
+    track_entries = False
+
+    def __init__(
+        self,
+        entries: Iterable = (),
+        ttl: float = OFFER_TTL,
+        max_size: int = OFFER_CACHE_MAX_SIZE,
+        encoded: Optional[str] = None
+    ):
+        super().__init__(entries, encoded)
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def _encode(self) -> str:
+        entries = list(self.values())
+        return pack({
+            "offers": [list(column) for column in zip(*(entry.offer for entry in entries))],
+            "fetched_at": [entry.fetched_at for entry in entries]
+        })
+
+    @classmethod
+    def from_compact(cls, encoded: str, **kwargs) -> "OfferCache":
+        data = unpack(encoded)
+        offers = map(Offer._make, zip(*data["offers"]))
+        offer_ids = data["offers"][0] if data["offers"] else []
+        return cls(
+            zip(offer_ids, map(CachedOffer._make, zip(offers, data["fetched_at"]))),
+            encoded=encoded,
+            **kwargs
+        )
+
+    def lookup(self, offer_id: OfferId) -> Optional[Offer]:
+        # reordering alone is not worth pushing the cache
+        entry = dict.pop(self, offer_id, None)
+        if entry is None:
+            return None
+        dict.__setitem__(self, offer_id, entry)  # most recently used
+        return entry.offer
+
+    def store(self, offer: Offer, fetched_at: Optional[float] = None):
+        self.pop(offer.offer_id, None)
+        self[offer.offer_id] = CachedOffer(offer, time.time() if fetched_at is None else fetched_at)
+
+    def is_stale(self, offer_id: OfferId) -> bool:
+        return time.time() - self[offer_id].fetched_at > self.ttl
+
+    def evict(self, owned_offer_ids: Set[OfferId]) -> int:
+        """Drop least recently used offers which are not owned until the cache fits in `max_size`"""
+        excess = len(self) - self.max_size
+        if excess <= 0:
+            return 0
+        evicted = [offer_id for offer_id in self if offer_id not in owned_offer_ids][:excess]
+        for offer_id in evicted:
+            del self[offer_id]
+        return len(evicted)
+
+
+class FailedOffer(NamedTuple):
+    failures: int
+    retry_at: float  # unix time
+
+
+class OfferFailures(CacheSection):
+    """Offers which failed to fetch (eg. delisted or region locked), skipped until their backoff expires"""
+    def __init__(
+        self,
+        entries: Iterable = (),
+        retry_delay: float = OFFER_RETRY_DELAY,
+        max_retry_delay: float = OFFER_MAX_RETRY_DELAY,
+        encoded: Optional[str] = None
+    ):
+        super().__init__(entries, encoded)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    def should_skip(self, offer_id: OfferId) -> bool:
+        entry = self.get(offer_id)
+        return entry is not None and time.time() < entry.retry_at
+
+    def record_failure(self, offer_id: OfferId) -> FailedOffer:
+        failures = self[offer_id].failures + 1 if offer_id in self else 1
+        delay = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+        entry = self[offer_id] = FailedOffer(failures, time.time() + delay)
+        return entry
+
+    def record_success(self, offer_id: OfferId):
+        self.pop(offer_id, None)
+
+    def retain(self, offer_ids: Set[OfferId]):
+        """Forget failures of offers which are not owned anymore"""
+        for offer_id in [offer_id for offer_id in self if offer_id not in offer_ids]:
+            del self[offer_id]
@@ -0,0 +1,152 @@
+"""
+Offers are public and the same for every user, so plugin processes of all accounts on the machine
+share them in a single SQLite catalog (in WAL mode, so readers do not block the writer).
+Per user caches keep only references to offers they use.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from backend import Offer, OfferId, SUPERCAT_LOCALE
+from cache_writer import CacheSection
+from offer_cache import CachedOffer, OFFER_CACHE_MAX_SIZE, OFFER_TTL
+
+
+logger = logging.getLogger(__name__)
+
+OFFER_CATALOG_VERSION = 1
+OFFER_CATALOG_FILE = "catalog.sqlite"
+OFFER_CATALOG_BUSY_TIMEOUT = 5  # seconds to wait for another process writing the catalog
+
+
+class OfferCatalog:
+    """Offers by id and locale shared between processes"""
+    def __init__(self, path: str, locale: str = SUPERCAT_LOCALE):
+        self.path = path
+        self.locale = locale
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=OFFER_CATALOG_BUSY_TIMEOUT)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        with self._connection:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != OFFER_CATALOG_VERSION:
+                # other processes may still run the previous version, they do not read offers in a new layout
+                logger.info("Recreating offer catalog of version %s", version)
+                self._connection.execute("DROP TABLE IF EXISTS offers")
+                self._connection.execute("PRAGMA user_version = {}".format(OFFER_CATALOG_VERSION))
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS offers (
+                    offer_id TEXT NOT NULL,
+                    locale TEXT NOT NULL,
+                    offer TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (offer_id, locale)
+                )
+                """
+            )
+
+    def get(self, offer_id: OfferId) -> Optional[CachedOffer]:
+        row = self._connection.execute(
+            "SELECT offer, fetched_at FROM offers WHERE offer_id = ? AND locale = ?", (offer_id, self.locale)
+        ).fetchone()
+        return None if row is None else CachedOffer(Offer._make(json.loads(row[0])), row[1])
+
+    def put(self, entries: Iterable[CachedOffer]):
+        """Store in a single transaction, entries fetched earlier than the stored ones are skipped"""
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO offers (offer_id, locale, offer, fetched_at)"
+                " SELECT ?1, ?2, ?3, ?4 WHERE NOT EXISTS ("
+                " SELECT 1 FROM offers WHERE offer_id = ?1 AND locale = ?2 AND fetched_at > ?4)",
+                ((entry.offer.offer_id, self.locale, json.dumps(entry.offer), entry.fetched_at) for entry in entries)
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+class OfferReferences(CacheSection):
+    """Ids of offers used by the user, least recently used first, encoded as a list"""
+    track_entries = False
+
+    def _encode(self) -> str:
+        return json.dumps(list(self))
+
+    @classmethod
+    def decode(cls, offer_ids: List[OfferId], encoded: Optional[str]) -> "OfferReferences":
+        return cls(dict.fromkeys(offer_ids), encoded=encoded)
+
+    def touch(self, offer_id: OfferId):
+        if dict.pop(self, offer_id, False) is False:
+            self.mark_changed()
+        dict.__setitem__(self, offer_id, None)  # most recently used; reordering alone is not worth pushing
+
+
+class CatalogOfferCache:
+    """`OfferCache` interface over the shared catalog, remembering which offers the user references"""
+    def __init__(
+        self,
+        catalog: OfferCatalog,
+        references: OfferReferences,
+        ttl: float = OFFER_TTL,
+        max_size: int = OFFER_CACHE_MAX_SIZE
+    ):
+        self._catalog = catalog
+        self.references = references
+        self.ttl = ttl
+        self.max_size = max_size
+        self._loaded: Dict[OfferId, Optional[CachedOffer]] = {}  # None for offers missing in catalog
+        self._pending: Dict[OfferId, CachedOffer] = {}
+
+    def _get(self, offer_id: OfferId) -> Optional[CachedOffer]:
+        try:
+            return self._loaded[offer_id]
+        except KeyError:
+            pass
+        try:
+            entry = self._catalog.get(offer_id)
+        except sqlite3.Error:
+            # eg. locked by another process or corrupted, the offer is fetched again
+            logger.exception("Failed to read offer %s from the catalog", offer_id)
+            entry = None
+        self._loaded[offer_id] = entry
+        return entry
+
+    def __contains__(self, offer_id) -> bool:
+        """Whether the offer is referenced by the user"""
+        return offer_id in self.references
+
+    def lookup(self, offer_id: OfferId) -> Optional[Offer]:
+        entry = self._get(offer_id)
+        if entry is None:
+            return None
+        self.references.touch(offer_id)
+        return entry.offer
+
+    def store(self, offer: Offer, fetched_at: Optional[float] = None):
+        entry = CachedOffer(offer, time.time() if fetched_at is None else fetched_at)
+        self._loaded[offer.offer_id] = self._pending[offer.offer_id] = entry
+        self.references.touch(offer.offer_id)
+
+    def is_stale(self, offer_id: OfferId) -> bool:
+        return time.time() - self._get(offer_id).fetched_at > self.ttl
+
+    def evict(self, owned_offer_ids: Set[OfferId]) -> int:
+        """Drop least recently used references to offers which are not owned; the catalog keeps offers"""
+        excess = len(self.references) - self.max_size
+        if excess <= 0:
+            return 0
+        evicted = [offer_id for offer_id in self.references if offer_id not in owned_offer_ids][:excess]
+        for offer_id in evicted:
+            del self.references[offer_id]
+        return len(evicted)
+
+    def commit(self):
+        if not self._pending:
+            return
+        self._catalog.put(self._pending.values())
+        self._pending.clear()
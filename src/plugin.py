@@ -2,13 +2,15 @@ import asyncio
 import pathlib
 import json
 import logging
+import os
 import platform
 import subprocess
+import sqlite3
 import sys
 import time
 import webbrowser
 from functools import partial
-from typing import Any, Callable, Dict, List, NewType, Optional, AsyncGenerator, NamedTuple, Set, Iterable
+from typing import Any, Awaitable, Callable, Dict, List, NewType, Optional, AsyncGenerator, NamedTuple, Set, Iterable, Tuple, Union
 
 from galaxy.api.consts import LicenseType, Platform
 from galaxy.api.errors import (
@@ -20,8 +22,23 @@ from galaxy.api.types import (
     NextStep, GameLibrarySettings, Subscription, SubscriptionGame
 )
 
-from backend import AuthenticatedHttpClient, MasterTitleId, OfferId, OriginBackendClient, Timestamp, AchievementSet, Json
+from backend import (
+    AuthenticatedHttpClient, Entitlement, MasterTitleId, MultiplayerId, Offer, OfferId, OriginBackendClient, Timestamp,
+    AchievementSet
+)
+from host_routing import HedgingPolicy
+from retry import RetryPolicy
+from cache_codec import is_compact
+from cache_writer import CacheSection, CacheWriter
+from game_time_cache import GameTimeCache
+from offer_cache import CachedOffer, FailedOffer, OfferCache, OfferFailures
+from offer_catalog import CatalogOfferCache, OfferCatalog, OfferReferences, OFFER_CATALOG_FILE
 from local_games import get_local_content_path, LocalGames, parse_map_crc_for_total_size
+from sqlite_store import (
+    get_plugin_data_path, get_shared_data_path, SqliteGameTimeCache, SqliteHttpCacheStore, SqliteOfferCache, SqliteStore,
+    SQLITE_STORE_FILE, SQLITE_STORE_VERSION
+)
+from sync_session import SyncSession
 from uri_scheme_handler import is_uri_handler_installed
 from version import __version__
 import re
@@ -35,6 +52,14 @@ def is_windows():
 
 
 LOCAL_GAMES_CACHE_VALID_PERIOD = 5
+OFFERS_FETCH_CONCURRENCY = 10
+OFFERS_REFRESH_CONCURRENCY = 2
+# errors describing the offer itself (eg. 404 of delisted offer, unexpected document), other ones are transient
+OFFER_FETCH_ERRORS = (UnknownError, UnknownBackendResponse, KeyError, TypeError, AttributeError)
+OFFER_CACHE_VERSION = "2"  # bump when `Offer` or `CachedOffer` fields change
+CACHE_STORE_ENV = "ORIGIN_CACHE_STORE"  # "sqlite" keeps large caches in a local store instead of persistent cache
+OFFER_CATALOG_ENV = "ORIGIN_OFFER_CATALOG"  # "shared", or path of the offer catalog shared by all plugin processes
+PREFETCH_ENV = "ORIGIN_PREFETCH"  # "1" starts fetching data for the first sync right after authentication
 AUTH_PARAMS = {
     "window_title": "Login to Origin",
     "window_width": 495 if is_windows() else 480,
@@ -54,7 +79,6 @@ r'''
 '''
 ]}
 
-MultiplayerId = NewType("MultiplayerId", str)
 GameId = NewType("GameId", str)  # eg. Origin.OFR:12345 or Origin.OFR:12345@epic
 
 
@@ -84,18 +108,237 @@ class OriginPlugin(Plugin):
         self._http_client = AuthenticatedHttpClient()
         self._http_client.set_auth_lost_callback(auth_lost)
         self._http_client.set_cookies_updated_callback(self._update_stored_cookies)
-        self._backend_client = OriginBackendClient(self._http_client)
-        self._persistent_cache_updated = False
+        self._backend_client = OriginBackendClient(
+            self._http_client,
+            hedging_policy=HedgingPolicy(),
+            retry_policy=RetryPolicy()
+        )
+        self._cache_writer = CacheWriter(self._push_cache)
+        self._identity_revalidation_task = None
+        self._offers_fetch_concurrency = OFFERS_FETCH_CONCURRENCY
+        self._offers_refresh_task = None
+        self._sync_session = SyncSession()
+        self._prefetch_task = None
+        self._sync_prefetched = False
+
+        # persistent cache sections decoded on first access
+        self._cache_sections: Dict[str, Any] = {}
+        self._sqlite_store: Optional[SqliteStore] = None
+        self._offer_catalog: Optional[OfferCatalog] = None
+
+    @property
+    def _game_time_cache(self) -> Union[GameTimeCache, SqliteGameTimeCache]:
+        if self._sqlite_store is not None:
+            return self._get_store_section(
+                "game_time",
+                lambda store: SqliteGameTimeCache(store, self._user_id),
+                self._decode_game_times,
+                GameTimeCache.from_compact
+            )
+        return self._get_cache_section("game_time", self._decode_game_times, GameTimeCache.from_compact)
 
     @property
-    def _game_time_cache(self) -> Dict[OfferId, GameTime]:
-        return self.persistent_cache.setdefault("game_time", {})
+    def _offer_id_cache(self) -> Union[OfferCache, SqliteOfferCache, CatalogOfferCache]:
+        if self._offer_catalog is not None:
+            return self._get_catalog_offer_cache()
+        if self._sqlite_store is not None:
+            return self._get_store_section(
+                "offers", SqliteOfferCache, self._decode_offers, self._decode_compact_offers
+            )
+        return self._get_cache_section("offers", self._decode_offers, self._decode_compact_offers)
 
     @property
-    def _offer_id_cache(self) -> Dict[OfferId, Json]:
-        return self.persistent_cache.setdefault("offers", {})
+    def _failed_offers(self) -> OfferFailures:
+        return self._get_cache_section("failed_offers", self._decode_failed_offers)
+
+    def _get_cache_section(
+        self,
+        key: str,
+        decoder: Callable[[Dict, Optional[str]], CacheSection],
+        compact_decoder: Optional[Callable[[str], CacheSection]] = None
+    ):
+        section = self._cache_sections.get(key)
+        if section is None:
+            section = self._cache_sections[key] = self._safe_decode(
+                self.persistent_cache.get(key), key, decoder, compact_decoder
+            )
+        return section
+
+    def _get_store_section(
+        self,
+        key: str,
+        factory: Callable[[SqliteStore], Any],
+        decoder: Callable[[Dict, Optional[str]], CacheSection],
+        compact_decoder: Optional[Callable[[str], CacheSection]] = None
+    ):
+        section = self._cache_sections.get(key)
+        if section is None:
+            section = self._cache_sections[key] = factory(self._sqlite_store)
+            if key in self.persistent_cache:
+                # kept in persistent cache before the store was enabled, moved to the store
+                section.update(self._safe_decode(self.persistent_cache.pop(key), key, decoder, compact_decoder).items())
+                if key == "offers":
+                    self.persistent_cache.pop("offers_version", None)
+                self._cache_writer.mark_dirty()
+        return section
+
+    def _get_catalog_offer_cache(self) -> CatalogOfferCache:
+        section = self._cache_sections.get("offers")
+        if section is None:
+            references = self._get_cache_section("offer_refs", OfferReferences.decode)
+            section = self._cache_sections["offers"] = CatalogOfferCache(self._offer_catalog, references)
+            if "offers" in self.persistent_cache:
+                # kept in persistent cache before the catalog was enabled, moved to the catalog
+                offers = self._safe_decode(
+                    self.persistent_cache.pop("offers"), "offers", self._decode_offers, self._decode_compact_offers
+                )
+                self.persistent_cache.pop("offers_version", None)
+                for offer_id in offers:
+                    references.touch(offer_id)
+                try:
+                    self._offer_catalog.put(offers.values())
+                except sqlite3.Error:
+                    logger.exception("Failed to move cached offers to the catalog")
+                self._cache_writer.mark_dirty()
+        return section
+
+    @staticmethod
+    def _open_offer_catalog() -> Optional[OfferCatalog]:
+        location = os.environ.get(OFFER_CATALOG_ENV)
+        if not location:
+            return None
+        path = os.path.join(get_shared_data_path(), OFFER_CATALOG_FILE) if location == "shared" else location
+        try:
+            return OfferCatalog(path)
+        except (sqlite3.Error, OSError):
+            logger.exception("Failed to open offer catalog, offers are cached per user")
+            return None
+
+    def _open_sqlite_store(self) -> Optional[SqliteStore]:
+        """Store pointed by persistent cache, or a new one when enabled by `CACHE_STORE_ENV`"""
+        pointer = self.persistent_cache.get("cache_store")
+        if not pointer and os.environ.get(CACHE_STORE_ENV) != "sqlite":
+            return None
+        try:
+            path = json.loads(pointer)["path"] if pointer else os.path.join(get_plugin_data_path(), SQLITE_STORE_FILE)
+            store = SqliteStore(path)
+        except (sqlite3.Error, OSError, ValueError, KeyError, TypeError):
+            logger.exception("Failed to open cache store, caches are kept in persistent cache")
+            return None
+        encoded_pointer = json.dumps({"path": path, "version": SQLITE_STORE_VERSION})
+        if pointer != encoded_pointer:
+            self.persistent_cache["cache_store"] = encoded_pointer
+            self._cache_writer.mark_dirty()
+        return store
+
+    @staticmethod
+    def _safe_decode(
+        cache: Optional[str],
+        key: str,
+        decoder: Callable[[Dict, Optional[str]], CacheSection],
+        compact_decoder: Optional[Callable[[str], CacheSection]] = None
+    ):
+        """
+            decoders get decoded json and the encoded one to reuse if nothing is changed during decoding,
+            sections in compact encoding are decoded by `compact_decoder`
+        """
+        if not cache:
+            return decoder({}, None)
+
+        try:
+            if compact_decoder is not None and is_compact(cache):
+                return compact_decoder(cache)
+            return decoder(json.loads(cache), cache)
+        except Exception:
+            logger.exception("Failed to decode persistent '%s' cache", key)
+            return decoder({}, None)
+
+    def _decode_game_times(self, cache: Dict, encoded: Optional[str]) -> GameTimeCache:
+        if cache:
+            # stored as json by previous versions, store in compact encoding
+            self._cache_writer.mark_dirty()
+
+        # after offerId -> gameId migration
+        outdated_keys = [key.split('@')[0] for key in cache if "@" in key]
+        for i in outdated_keys:
+            cache.pop(i, None)
+
+        game_times = {
+            game_id: GameTime(entry["game_id"], entry["time_played"], entry.get("last_played_time"))
+            for game_id, entry in cache.items()
+            if entry and game_id
+        }
+        return GameTimeCache(game_times)
+
+    def _decode_compact_offers(self, encoded: str) -> OfferCache:
+        if self.persistent_cache.get("offers_version") != OFFER_CACHE_VERSION:
+            raise ValueError("Unsupported offers cache version {}".format(self.persistent_cache.get("offers_version")))
+        return OfferCache.from_compact(encoded)
+
+    def _decode_offers(self, cache: Dict, encoded: Optional[str]) -> OfferCache:
+        version = self.persistent_cache.get("offers_version")
+        self.persistent_cache["offers_version"] = OFFER_CACHE_VERSION
+        if cache:
+            # stored as json by previous versions, store migrated offers in compact encoding,
+            # so they are not migrated on every start
+            self._cache_writer.mark_dirty()
+
+        if version == OFFER_CACHE_VERSION:
+            return OfferCache(
+                (offer_id, CachedOffer(Offer(*offer), fetched_at))
+                for offer_id, (offer, fetched_at) in cache.items()
+            )
+
+        if version == "1":
+            # projected offers without fetch time, refreshed in background when used
+            return OfferCache((offer_id, CachedOffer(Offer(*offer), 0)) for offer_id, offer in cache.items())
+
+        # full supercat documents stored by previous versions
+        offers = OfferCache()
+        for offer_id, entry in cache.items():
+            try:
+                offers.store(Offer.from_json(entry), fetched_at=0)
+            except (KeyError, TypeError, AttributeError):
+                logger.info("Dropping cached offer %s, it will be fetched again", offer_id)
+        return offers
+
+    @staticmethod
+    def _decode_failed_offers(cache: Dict, encoded: Optional[str]) -> OfferFailures:
+        return OfferFailures(
+            ((offer_id, FailedOffer(*entry)) for offer_id, entry in cache.items()),
+            encoded=encoded
+        )
+
+    def _push_cache(self):
+        # sections not decoded yet stay as they are, decoded ones which did not change reuse their encoded content
+        for key, section in self._cache_sections.items():
+            if isinstance(section, CacheSection):
+                self.persistent_cache[key] = section.encode()
+                continue
+            try:
+                section.commit()
+            except sqlite3.Error:
+                logger.exception("Failed to write '%s' cache to the store", key)
+        self.push_cache()
 
     async def shutdown(self):
+        if self._identity_revalidation_task is not None:
+            self._identity_revalidation_task.cancel()
+        if self._offers_refresh_task is not None:
+            self._offers_refresh_task.cancel()
+        self._cancel_prefetch()
+        self._cache_writer.flush()
+        logger.info(
+            "Cache writer stats: %d pushes, %d coalesced changes",
+            self._cache_writer.pushes, self._cache_writer.coalesced
+        )
+        logger.info("Connection pool stats: %s", self._http_client.pool_stats)
+        logger.info("Http cache stats: %s", self._http_client.cache_stats)
+        logger.info("Sync session stats: %d reused results", self._sync_session.hits)
+        if self._sqlite_store is not None:
+            self._sqlite_store.close()
+        if self._offer_catalog is not None:
+            self._offer_catalog.close()
         await self._http_client.close()
 
     def tick(self):
@@ -110,7 +353,18 @@ class OriginPlugin(Plugin):
         try:
             await self._http_client.authenticate(cookies)
 
+            cached_identity = self._load_identity()
+            if cached_identity is not None:
+                self._user_id, self._persona_id, user_name = cached_identity
+                self._http_client.set_cache_scope(str(self._user_id))
+                self._identity_revalidation_task = asyncio.create_task(self._revalidate_identity(cached_identity))
+                self._start_prefetch()
+                return Authentication(self._user_id, user_name)
+
             self._user_id, self._persona_id, user_name = await self._backend_client.get_identity()
+            self._http_client.set_cache_scope(str(self._user_id))
+            self._save_identity((self._user_id, self._persona_id, user_name))
+            self._start_prefetch()
             return Authentication(self._user_id, user_name)
 
         except (AccessDenied, InvalidCredentials, AuthenticationRequired) as e:
@@ -127,23 +381,137 @@ class OriginPlugin(Plugin):
 
     async def pass_login_credentials(self, step, credentials, cookies):
         new_cookies = {cookie["name"]: cookie["value"] for cookie in cookies}
+        # token and identity cached from previous session may belong to another account
+        self._http_client.forget_cached_access_token()
+        previous_identity = self._load_identity()
+        self.persistent_cache.pop("identity", None)
         auth_info = await self._do_authenticate(new_cookies)
+        if previous_identity is None or previous_identity[0] != self._user_id:
+            self._forget_game_times(self._user_id)
         self._store_cookies(new_cookies)
         return auth_info
 
+    def _load_identity(self) -> Optional[Tuple[str, str, str]]:
+        try:
+            identity = json.loads(self.persistent_cache["identity"])
+            return identity["user_id"], identity["persona_id"], identity["user_name"]
+        except KeyError:
+            return None
+        except (TypeError, ValueError):
+            logger.exception("Failed to decode persistent 'identity' cache")
+            return None
+
+    def _save_identity(self, identity: Tuple[str, str, str]):
+        user_id, persona_id, user_name = identity
+        self.persistent_cache["identity"] = json.dumps({
+            "user_id": user_id,
+            "persona_id": persona_id,
+            "user_name": user_name
+        })
+        self._cache_writer.mark_dirty()
+
+    async def _revalidate_identity(self, cached_identity: Tuple[str, str, str]):
+        try:
+            identity = await self._backend_client.get_identity()
+        except Exception as e:
+            # auth lost is reported by http client if it is the reason
+            logger.warning("Failed to revalidate identity: %s", repr(e))
+            return
+
+        if identity != cached_identity:
+            logger.info("Identity changed since it was cached")
+            self._http_client.set_cache_scope(None)
+            self._cancel_prefetch()
+            self._sync_session.invalidate()
+            self._forget_game_times(identity[0])
+            self._save_identity(identity)
+            self.lost_authentication()
+
+    def _forget_game_times(self, user_id: str):
+        """Game times are per user, drop ones cached for other accounts"""
+        self._cache_sections.pop("game_time", None)
+        if self._sqlite_store is not None:
+            try:
+                SqliteGameTimeCache(self._sqlite_store, user_id).forget_other_users()
+            except sqlite3.Error:
+                logger.exception("Failed to drop game times of other users from the store")
+        elif self.persistent_cache.pop("game_time", None) is not None:
+            self._cache_writer.mark_dirty()
+
+    def _start_prefetch(self):
+        if os.environ.get(PREFETCH_ENV) != "1":
+            return
+        self._cancel_prefetch()
+        self._sync_session.invalidate()
+        self._sync_prefetched = True
+        self._prefetch_task = asyncio.create_task(self._prefetch())
+
+    def _cancel_prefetch(self):
+        self._sync_prefetched = False
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            self._prefetch_task = None
+            # stop requests started by prefetch, backend requests are aborted unless a sync is waiting for them too
+            self._sync_session.cancel()
+
+    async def _prefetch(self):
+        """Fetch data the first sync asks for in the background, so `prepare_*_context` calls find it ready"""
+        start = time.time()
+        try:
+            results = await asyncio.gather(
+                self._get_owned_offers(),  # entitlements and missing offers
+                self._get_lastplayed_games(),
+                self._get_favorite_games(),
+                self._get_hidden_games(),
+                self._get_achievements(),
+                return_exceptions=True
+            )
+            failed = [result for result in results if isinstance(result, Exception)]
+            logger.info(
+                "Prefetched data for the first sync in %.2f s, %d of %d requests failed",
+                time.time() - start, len(failed), len(results)
+            )
+        finally:
+            self._prefetch_task = None
+
+    def _get_lastplayed_games(self) -> Awaitable[Dict[MasterTitleId, Timestamp]]:
+        return self._sync_session.get(
+            ("lastplayed", self._user_id), partial(self._backend_client.get_lastplayed_games, self._user_id)
+        )
+
+    def _get_favorite_games(self) -> Awaitable[Set[OfferId]]:
+        return self._sync_session.get(
+            ("favorite_games", self._user_id), partial(self._backend_client.get_favorite_games, self._user_id)
+        )
+
+    def _get_hidden_games(self) -> Awaitable[Set[OfferId]]:
+        return self._sync_session.get(
+            ("hidden_games", self._user_id), partial(self._backend_client.get_hidden_games, self._user_id)
+        )
+
+    def _get_achievements(self) -> Awaitable[Dict[AchievementSet, List[Achievement]]]:
+        return self._sync_session.get(
+            ("achievements", self._persona_id), partial(self._backend_client.get_achievements, self._persona_id)
+        )
+
     @staticmethod
     def _offer_id_from_game_id(game_id: GameId) -> OfferId:
         return OfferId(game_id.split('@')[0])
 
     async def get_owned_games(self) -> List[Game]:
         self._check_authenticated()
+        # owned games are requested first in a sync, imports which follow reuse its results;
+        # the first sync after authentication reuses prefetched ones
+        if not self._sync_prefetched:
+            self._sync_session.invalidate()
+        self._sync_prefetched = False
 
         owned_offers = await self._get_owned_offers()
         games = []
         for game_id, offer in owned_offers.items():
             game = Game(
                 game_id,
-                offer["i18n"]["displayName"],
+                offer.display_name,
                 None,
                 LicenseInfo(LicenseType.SinglePurchase, None)
             )
@@ -151,24 +519,15 @@ class OriginPlugin(Plugin):
 
         return games
 
-    @staticmethod
-    def _get_achievement_set_override(offer: Json) -> Optional[AchievementSet]:
-        potential_achievement_set = None
-        for achievement_set in offer["platforms"]:
-            potential_achievement_set = achievement_set["achievementSetOverride"]
-            if achievement_set["platform"] == "PCWIN":
-                return potential_achievement_set
-        return potential_achievement_set
-
     async def prepare_achievements_context(self, game_ids: List[GameId]) -> AchievementsImportContext:
         self._check_authenticated()
-        owned_offers: Dict[GameId, Json] = await self._get_owned_offers()
+        owned_offers: Dict[GameId, Offer] = await self._get_owned_offers()
         achievement_sets: Dict[OfferId, AchievementSet] = dict()
         for game_id, offer in owned_offers.items():
-            achievement_sets[game_id] = self._get_achievement_set_override(offer)
+            achievement_sets[game_id] = offer.achievement_set
         return AchievementsImportContext(
             owned_games=achievement_sets,
-            achievements=await self._backend_client.get_achievements(self._persona_id)
+            achievements=await self._get_achievements()
         )
 
     async def get_unlocked_achievements(self, game_id: GameId, context: AchievementsImportContext) -> List[Achievement]:
@@ -195,51 +554,104 @@ class OriginPlugin(Plugin):
             logger.exception("Failed to parse achievements for game {}".format(game_id))
             raise UnknownBackendResponse()
 
-    async def _get_offers(self, offer_ids: Iterable[OfferId]) -> Dict[OfferId, Json]:
+    async def _get_offers(self, offer_ids: Iterable[OfferId]) -> Dict[OfferId, Offer]:
         """
-            Get offers from cache if exists.
+            Get offers from cache if exists, stale ones are refreshed in background.
             Fetch from backend if not and update cache.
+            Offers which recently failed to fetch are skipped until their backoff expires.
         """
         offers = {}
         missing_offers = []
-        for offer_id in offer_ids:
-            offer = self._offer_id_cache.get(offer_id, None)
+        stale_offers = []
+        # the same offer may be owned under several external types
+        for offer_id in dict.fromkeys(offer_ids):
+            offer = self._offer_id_cache.lookup(offer_id)
             if offer is not None:
                 offers[offer_id] = offer
-            else:
+            if self._failed_offers.should_skip(offer_id):
+                continue
+            if offer is None:
                 missing_offers.append(offer_id)
+            elif self._offer_id_cache.is_stale(offer_id):
+                stale_offers.append(offer_id)
 
         # request for missing offers
         if missing_offers:
-            requests = [self._backend_client.get_offer(offer_id) for offer_id in missing_offers]
-            new_offers = await asyncio.gather(*requests, return_exceptions=True)
+            offers.update(await self._fetch_offers(missing_offers, self._offers_fetch_concurrency))
+            self._cache_writer.mark_dirty()
 
-            for offer in new_offers:
-                if isinstance(offer, Exception):
-                    logger.error(repr(offer))
-                    continue
-                offer_id = offer["offerId"]
-                offers[offer_id] = offer
-                self._offer_id_cache[offer_id] = offer
+        if stale_offers and self._offers_refresh_task is None:
+            self._offers_refresh_task = asyncio.create_task(self._refresh_offers(stale_offers))
 
-            self.push_cache()
+        return offers
 
+    async def _fetch_offers(self, offer_ids: List[OfferId], concurrency: int) -> Dict[OfferId, Offer]:
+        offers = {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_offer(offer_id: OfferId) -> Optional[Offer]:
+            async with semaphore:
+                try:
+                    offer = Offer.from_json(await self._backend_client.get_offer(offer_id))
+                except OFFER_FETCH_ERRORS as e:
+                    failure = self._failed_offers.record_failure(offer_id)
+                    logger.error(
+                        "Failed to fetch offer %s: %r, skipping it for %d s",
+                        offer_id, e, failure.retry_at - time.time()
+                    )
+                    return None
+                except Exception as e:
+                    logger.error("Failed to fetch offer %s: %r", offer_id, e)
+                    return None
+            self._failed_offers.record_success(offer_id)
+            return offer
+
+        # tasks are started in order, semaphore keeps at most `concurrency` requests in flight
+        tasks = [asyncio.ensure_future(fetch_offer(offer_id)) for offer_id in offer_ids]
+        try:
+            for next_offer in asyncio.as_completed(tasks):
+                offer = await next_offer
+                if offer is None:
+                    continue
+                offers[offer.offer_id] = offer
+                self._offer_id_cache.store(offer)
+        finally:
+            for task in tasks:
+                task.cancel()
         return offers
+
+    async def _refresh_offers(self, offer_ids: List[OfferId]):
+        """Refetch stale offers with low concurrency, so they do not compete with user facing requests"""
+        try:
+            refreshed = await self._fetch_offers(offer_ids, OFFERS_REFRESH_CONCURRENCY)
+            logger.info("Refreshed %d of %d stale offers", len(refreshed), len(offer_ids))
+            if refreshed:
+                self._cache_writer.mark_dirty()
+        finally:
+            self._offers_refresh_task = None
     
-    async def _get_owned_offers(self) -> Dict[GameId, Json]:
-        def get_game_id(entitlement: Json) -> GameId:
-            offer_id = entitlement["offerId"]
-            external_type = entitlement.get("externalType")
+    def _get_owned_offers(self) -> Awaitable[Dict[GameId, Offer]]:
+        return self._sync_session.get(("owned_offers", self._user_id), self._fetch_owned_offers)
+
+    async def _fetch_owned_offers(self) -> Dict[GameId, Offer]:
+        def get_game_id(entitlement: Entitlement) -> GameId:
+            offer_id = entitlement.offer_id
+            external_type = entitlement.external_type
             return GameId(f"{offer_id}@{external_type.lower()}" if external_type else offer_id)
 
-        entitlements = await self._backend_client.get_entitlements(self._user_id)
-        basegame_entitlements = [x for x in entitlements if x["offerType"] == "basegame"]
-        basegame_offers = await self._get_offers([x["offerId"] for x in basegame_entitlements])
+        basegame_entitlements = await self._sync_session.get(
+            ("entitlements", self._user_id),
+            partial(self._backend_client.get_entitlements, self._user_id, offer_type="basegame")
+        )
+        basegame_offers = await self._get_offers([x.offer_id for x in basegame_entitlements])
+        owned_offer_ids = {x.offer_id for x in basegame_entitlements}
+        self._offer_id_cache.evict(owned_offer_ids)
+        self._failed_offers.retain(owned_offer_ids)
 
         return {
-            get_game_id(ent): basegame_offers[ent["offerId"]]
+            get_game_id(ent): basegame_offers[ent.offer_id]
             for ent in basegame_entitlements
-            if ent["offerId"] in basegame_offers
+            if ent.offer_id in basegame_offers
         }
 
     async def get_subscriptions(self) -> List[Subscription]:
@@ -285,6 +697,9 @@ class OriginPlugin(Plugin):
             finally:
                 self._local_games_update_in_progress = False
 
+            if notify_list:
+                # eg. a game was closed, its last played time is outdated
+                self._sync_session.invalidate()
             for local_game_notify in notify_list:
                 self.update_local_game_status(local_game_notify)
 
@@ -314,14 +729,6 @@ class OriginPlugin(Plugin):
         except KeyError:
             raise UnknownError("Manifest not found")
 
-    @staticmethod
-    def _get_multiplayer_id(offer) -> Optional[MultiplayerId]:
-        for game_platform in offer["platforms"]:
-            multiplayer_id = game_platform["multiPlayerId"]
-            if multiplayer_id is not None:
-                return multiplayer_id
-        return None
-
     async def _get_game_times_for_master_title(
         self,
         game_id: GameId,
@@ -357,7 +764,7 @@ class OriginPlugin(Plugin):
         response = await self._backend_client.get_game_time(self._user_id, master_title_id, multiplayer_id)
         game_time: GameTime = GameTime(game_id, response[0], response[1])
         self._game_time_cache[game_id] = game_time
-        self._persistent_cache_updated = True
+        self._cache_writer.mark_dirty()
         return game_time
 
     async def prepare_game_times_context(self, game_ids: List[GameId]) -> Any:
@@ -366,7 +773,7 @@ class OriginPlugin(Plugin):
 
         _, last_played_games = await asyncio.gather(
             self._get_offers(offer_ids),  # update local cache ignoring return value
-            self._backend_client.get_lastplayed_games(self._user_id)
+            self._get_lastplayed_games()
         )
 
         return last_played_games
@@ -374,13 +781,16 @@ class OriginPlugin(Plugin):
     async def get_game_time(self, game_id: GameId, last_played_games: Any) -> GameTime:
         offer_id = self._offer_id_from_game_id(game_id)
         try:
-            offer = self._offer_id_cache.get(offer_id)
+            offer = self._offer_id_cache.lookup(offer_id)
             if offer is None:
                 logger.exception("Internal cache out of sync")
                 raise UnknownError()
 
-            master_title_id: MasterTitleId = offer["masterTitleId"]
-            multiplayer_id: Optional[MultiplayerId] = self._get_multiplayer_id(offer)
+            master_title_id: Optional[MasterTitleId] = offer.master_title_id
+            if master_title_id is None:
+                logger.error("Offer %s has no master title id", offer_id)
+                raise UnknownBackendResponse()
+            multiplayer_id: Optional[MultiplayerId] = offer.multiplayer_id
 
             return await self._get_game_times_for_master_title(
                 game_id,
@@ -394,15 +804,13 @@ class OriginPlugin(Plugin):
             raise UnknownBackendResponse()
 
     def game_times_import_complete(self):
-        if self._persistent_cache_updated:
-            self.push_cache()
-            self._persistent_cache_updated = False
+        self._cache_writer.flush()
 
     async def prepare_game_library_settings_context(self, game_ids: List[GameId]) -> GameLibrarySettingsContext:
         self._check_authenticated()
         favorite_games, hidden_games = await asyncio.gather(
-            self._backend_client.get_favorite_games(self._user_id),
-            self._backend_client.get_hidden_games(self._user_id)
+            self._get_favorite_games(),
+            self._get_hidden_games()
         )
         return GameLibrarySettingsContext(
             favorite=favorite_games,
@@ -484,45 +892,33 @@ class OriginPlugin(Plugin):
         self._store_cookies(cookies)
 
     def handshake_complete(self):
-        def game_time_decoder(cache: Dict) -> Dict[OfferId, GameTime]:
-
-            # after offerId -> gameId migration
-            outdated_keys = [key.split('@')[0] for key in cache if "@" in key]
-            for i in outdated_keys:
-                cache.pop(i, None)
-
-            return {
-                game_id: GameTime(entry["game_id"], entry["time_played"], entry.get("last_played_time"))
-                for game_id, entry in cache.items()
-                if entry and game_id
-            }
-
-        def safe_decode(_cache: Dict, _key: str, _decoder: Callable):
-            if not _cache:
-                return {}
-            if _decoder is None:
-                _decoder = lambda x: x
-
-            try:
-                return _decoder(json.loads(_cache))
-            except Exception:
-                logger.exception("Failed to decode persistent '%s' cache", _key)
-                return {}
-
-        # parse caches
-        cache_decoders = {
-            "offers": None,
-            "game_time": game_time_decoder,
-        }
-        for key, decoder in cache_decoders.items():
-            self.persistent_cache[key] = safe_decode(self.persistent_cache.get(key), key, decoder)
+        # cache sections are decoded on first access
+        self._cache_sections.clear()
+        if self._sqlite_store is not None:
+            self._sqlite_store.close()
+        self._sqlite_store = self._open_sqlite_store()
+        if self._sqlite_store is not None:
+            self._http_client.set_cache_store(SqliteHttpCacheStore(self._sqlite_store))
+        if self._offer_catalog is not None:
+            self._offer_catalog.close()
+        self._offer_catalog = self._open_offer_catalog()
 
         self._http_client.load_lats_from_cache(self.persistent_cache.get('lats'))
         self._http_client.set_save_lats_callback(self._save_lats)
+        self._http_client.load_access_token_from_cache(
+            self.persistent_cache.get('access_token'),
+            self.persistent_cache.get('access_token_expiration')
+        )
+        self._http_client.set_save_access_token_callback(self._save_access_token)
 
     def _save_lats(self, lats: int):
         self.persistent_cache['lats'] = str(lats)
-        self.push_cache()
+        self._cache_writer.mark_dirty()
+
+    def _save_access_token(self, access_token: Optional[str], expiration: Optional[float]):
+        self.persistent_cache['access_token'] = access_token or ""
+        self.persistent_cache['access_token_expiration'] = str(expiration) if expiration is not None else ""
+        self._cache_writer.mark_dirty()
 
 def main():
     create_and_run_plugin(OriginPlugin, sys.argv)
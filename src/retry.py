@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+from galaxy.api.errors import BackendNotAvailable, BackendTimeout, NetworkError
+
+
+logger = logging.getLogger(__name__)
+
+
+RETRIABLE_ERRORS = (BackendNotAvailable, BackendTimeout, NetworkError)
+
+
+class RetryBudget:
+    """
+        Limits retries to a share of successful requests, so a backend outage does not
+        multiply the traffic. Each success deposits `ratio` of a token, each retry withdraws one.
+    """
+    def __init__(self, ratio: float = 0.2, initial_tokens: float = 10, max_tokens: float = 50):
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self.tokens = initial_tokens
+
+    def deposit(self):
+        self.tokens = min(self._max_tokens, self.tokens + self._ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    """
+        Retries transient backend failures of idempotent requests with exponential backoff
+        and full jitter (random delay up to `base_delay * 2^attempt`, capped by `max_delay`),
+        so clients failing at the same moment do not retry in sync.
+        `deadline` bounds the whole call including all attempts and delays.
+    """
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 60.0,
+        budget: RetryBudget = None
+    ):
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._deadline = deadline
+        self._budget = budget or RetryBudget()
+
+    async def run(self, request: Callable[[], Awaitable[Any]]):
+        deadline = time.monotonic() + self._deadline
+        attempt = 1
+        while True:
+            try:
+                result = await asyncio.wait_for(request(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise BackendTimeout()
+            except RETRIABLE_ERRORS as e:
+                delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+                if attempt >= self._max_attempts or time.monotonic() + delay >= deadline:
+                    raise
+                if not self._budget.withdraw():
+                    logger.warning("Retry budget exhausted, not retrying %s", repr(e))
+                    raise
+                logger.info("Retrying in %.2fs (attempt %d) after %s", delay, attempt, repr(e))
+                await asyncio.sleep(delay)
+                attempt += 1
+            else:
+                self._budget.deposit()
+                return result
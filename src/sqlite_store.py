@@ -0,0 +1,299 @@
+"""
+Optional local SQLite store for offer, game time and HTTP caches, used instead of keeping them
+in Galaxy's persistent cache, which is held in memory and sent whole on every push.
+Rows are read when first looked up and changes are written in a single transaction on commit.
+"""
+import json
+import logging
+import os
+import platform
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from galaxy.api.types import GameTime
+
+from backend import Offer, OfferId
+from http_cache import CacheEntry
+from offer_cache import CachedOffer, OFFER_CACHE_MAX_SIZE, OFFER_TTL
+
+
+logger = logging.getLogger(__name__)
+
+SQLITE_STORE_VERSION = 2
+SQLITE_STORE_FILE = "cache.sqlite"
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS offers (
+        offer_id TEXT PRIMARY KEY,
+        offer TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        used_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS offers_used_at ON offers (used_at)",
+    """
+    CREATE TABLE IF NOT EXISTS game_times (
+        user_id TEXT NOT NULL,
+        game_id TEXT NOT NULL,
+        time_played INTEGER,
+        last_played_time INTEGER,
+        game_time_id TEXT,
+        PRIMARY KEY (user_id, game_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS http_cache (
+        key TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        body BLOB NOT NULL,
+        content_type TEXT,
+        charset TEXT
+    )
+    """,
+]
+
+
+def get_plugin_data_path() -> str:
+    platform_id = platform.system()
+
+    if platform_id == "Windows":
+        local_app_data = os.environ.get("LOCALAPPDATA", os.path.expanduser(os.path.join("~", "AppData", "Local")))
+        return os.path.join(local_app_data, "GOG.com", "Galaxy", "plugins", "data", "origin")
+    if platform_id == "Darwin":
+        return os.path.join(
+            os.path.expanduser("~"), "Library", "Application Support", "GOG.com", "Galaxy", "plugins", "data", "origin"
+        )
+    return "."  # fallback for testing on another platform
+
+
+def get_shared_data_path() -> str:
+    """Directory shared by plugin processes of all users and Galaxy profiles on the machine"""
+    platform_id = platform.system()
+
+    if platform_id == "Windows":
+        program_data = os.environ.get("ProgramData", os.environ.get("SystemDrive", "C:") + R"\ProgramData")
+        return os.path.join(program_data, "GOG.com", "Galaxy", "plugins", "data", "origin")
+    if platform_id == "Darwin":
+        return os.path.join(os.sep, "Users", "Shared", "GOG.com", "Galaxy", "plugins", "data", "origin")
+    return "."  # fallback for testing on another platform
+
+
+class SqliteStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        with self.transaction() as connection:
+            if version != SQLITE_STORE_VERSION:
+                logger.info("Recreating cache store of version %s", version)
+                for table in ["offers", "game_times", "http_cache"]:
+                    connection.execute("DROP TABLE IF EXISTS {}".format(table))
+                connection.execute("PRAGMA user_version = {}".format(SQLITE_STORE_VERSION))
+            for statement in _SCHEMA:
+                connection.execute(statement)
+
+    @contextmanager
+    def transaction(self):
+        with self._connection:  # commits, or rolls back on exception
+            yield self._connection
+
+    def close(self):
+        self._connection.close()
+
+
+class SqliteOfferCache:
+    """`OfferCache` interface over the offers table; least recently used order is kept in `used_at` column"""
+    def __init__(self, store: SqliteStore, ttl: float = OFFER_TTL, max_size: int = OFFER_CACHE_MAX_SIZE):
+        self._store = store
+        self.ttl = ttl
+        self.max_size = max_size
+        self._loaded: Dict[OfferId, Optional[CachedOffer]] = {}  # None for offers known to be missing
+        self._changed: Set[OfferId] = set()
+        self._used: Dict[OfferId, float] = {}
+
+    def _get(self, offer_id: OfferId) -> Optional[CachedOffer]:
+        try:
+            return self._loaded[offer_id]
+        except KeyError:
+            pass
+        try:
+            with self._store.transaction() as connection:
+                row = connection.execute(
+                    "SELECT offer, fetched_at FROM offers WHERE offer_id = ?", (offer_id,)
+                ).fetchone()
+        except sqlite3.Error:
+            # eg. locked or corrupted store, the offer is fetched again
+            logger.exception("Failed to read offer %s from the cache store", offer_id)
+            row = None
+        entry = None if row is None else CachedOffer(Offer._make(json.loads(row[0])), row[1])
+        self._loaded[offer_id] = entry
+        return entry
+
+    def __contains__(self, offer_id) -> bool:
+        return self._get(offer_id) is not None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._changed or self._used)
+
+    def lookup(self, offer_id: OfferId) -> Optional[Offer]:
+        entry = self._get(offer_id)
+        if entry is None:
+            return None
+        self._used[offer_id] = time.time()
+        return entry.offer
+
+    def store(self, offer: Offer, fetched_at: Optional[float] = None):
+        self._loaded[offer.offer_id] = CachedOffer(offer, time.time() if fetched_at is None else fetched_at)
+        self._changed.add(offer.offer_id)
+
+    def is_stale(self, offer_id: OfferId) -> bool:
+        return time.time() - self._get(offer_id).fetched_at > self.ttl
+
+    def evict(self, owned_offer_ids: Set[OfferId]) -> int:
+        """Drop least recently used offers which are not owned until the cache fits in `max_size`"""
+        self.commit()
+        with self._store.transaction() as connection:
+            excess = connection.execute("SELECT COUNT(*) FROM offers").fetchone()[0] - self.max_size
+            if excess <= 0:
+                return 0
+            evicted = []
+            for (offer_id,) in connection.execute("SELECT offer_id FROM offers ORDER BY used_at"):
+                if offer_id not in owned_offer_ids:
+                    evicted.append(offer_id)
+                    if len(evicted) == excess:
+                        break
+            connection.executemany("DELETE FROM offers WHERE offer_id = ?", ((offer_id,) for offer_id in evicted))
+        for offer_id in evicted:
+            self._loaded[offer_id] = None
+        return len(evicted)
+
+    def update(self, entries: Iterable[Tuple[OfferId, CachedOffer]]):
+        """Import entries, eg. from persistent cache"""
+        for offer_id, entry in entries:
+            self._loaded[offer_id] = entry
+            self._changed.add(offer_id)
+
+    def commit(self):
+        if not self.changed:
+            return
+        now = time.time()
+        changed = [(offer_id, self._loaded[offer_id]) for offer_id in self._changed]
+        with self._store.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO offers (offer_id, offer, fetched_at, used_at) VALUES (?, ?, ?, ?)",
+                (
+                    (offer_id, json.dumps(entry.offer), entry.fetched_at, self._used.get(offer_id, now))
+                    for offer_id, entry in changed
+                )
+            )
+            connection.executemany(
+                "UPDATE offers SET used_at = ? WHERE offer_id = ?",
+                ((used_at, offer_id) for offer_id, used_at in self._used.items() if offer_id not in self._changed)
+            )
+        self._changed.clear()
+        self._used.clear()
+
+
+class SqliteGameTimeCache:
+    """Game times by game id of one user over the game_times table"""
+    def __init__(self, store: SqliteStore, user_id: str):
+        self._store = store
+        self.user_id = user_id
+        self._loaded: Dict[str, Optional[GameTime]] = {}
+        self._changed: Set[str] = set()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._changed)
+
+    def get(self, game_id: str, default=None) -> Optional[GameTime]:
+        try:
+            game_time = self._loaded[game_id]
+        except KeyError:
+            with self._store.transaction() as connection:
+                row = connection.execute(
+                    "SELECT time_played, last_played_time, game_time_id FROM game_times"
+                    " WHERE user_id = ? AND game_id = ?",
+                    (self.user_id, game_id)
+                ).fetchone()
+            game_time = None if row is None else GameTime(row[2] or game_id, row[0], row[1])
+            self._loaded[game_id] = game_time
+        return default if game_time is None else game_time
+
+    def __getitem__(self, game_id: str) -> GameTime:
+        game_time = self.get(game_id)
+        if game_time is None:
+            raise KeyError(game_id)
+        return game_time
+
+    def __contains__(self, game_id) -> bool:
+        return self.get(game_id) is not None
+
+    def __setitem__(self, game_id: str, game_time: GameTime):
+        self._loaded[game_id] = game_time
+        self._changed.add(game_id)
+
+    def update(self, entries: Iterable[Tuple[str, GameTime]]):
+        for game_id, game_time in entries:
+            self[game_id] = game_time
+
+    def commit(self):
+        if not self._changed:
+            return
+        with self._store.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO game_times (user_id, game_id, time_played, last_played_time, game_time_id)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        self.user_id,
+                        game_id,
+                        game_time.time_played,
+                        game_time.last_played_time,
+                        game_time.game_id if game_time.game_id != game_id else None
+                    )
+                    for game_id, game_time in ((game_id, self._loaded[game_id]) for game_id in self._changed)
+                )
+            )
+        self._changed.clear()
+
+    def forget_other_users(self):
+        """Drop game times of other accounts, eg. after logging in as another user"""
+        with self._store.transaction() as connection:
+            connection.execute("DELETE FROM game_times WHERE user_id != ?", (self.user_id,))
+
+
+class SqliteHttpCacheStore:
+    """Backing store of `HttpCache` entries"""
+    def __init__(self, store: SqliteStore):
+        self._store = store
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key)
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._store.transaction() as connection:
+            row = connection.execute(
+                "SELECT etag, last_modified, body, content_type, charset FROM http_cache WHERE key = ?",
+                (self._key(key),)
+            ).fetchone()
+        return None if row is None else CacheEntry(*row)
+
+    def put(self, key: Hashable, entry: CacheEntry):
+        with self._store.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO http_cache (key, etag, last_modified, body, content_type, charset)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(key), *entry)
+            )
+
+    def delete(self, key: Hashable):
+        with self._store.transaction() as connection:
+            connection.execute("DELETE FROM http_cache WHERE key = ?", (self._key(key),))
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+SYNC_SESSION_TTL = 5 * 60  # seconds, long enough for all imports of one sync to be prepared
+
+
+class SyncSession:
+    """
+        Memoizes backend results shared by `get_owned_games` and `prepare_*_context` calls of one sync,
+        so eg. entitlements are fetched once per sync instead of once per import.
+        Results expire after `ttl` or when invalidated; failed fetches are not memoized.
+    """
+    def __init__(self, ttl: float = SYNC_SESSION_TTL):
+        self._ttl = ttl
+        self._results: Dict[Hashable, Tuple[float, asyncio.Future]] = {}
+        self.hits = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._results.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry[0] <= self._ttl:
+            self.hits += 1
+            future = entry[1]
+        else:
+            future = asyncio.ensure_future(fetch())
+            self._results[key] = (now, future)
+
+            def done(_future):
+                if _future.cancelled() or _future.exception() is not None:
+                    if self._results.get(key, (None, None))[1] is _future:
+                        del self._results[key]
+
+            future.add_done_callback(done)
+        # shielded, so cancelling one of the callers does not abort the others
+        return await asyncio.shield(future)
+
+    def cancel(self):
+        """Cancel fetches in flight and forget all results"""
+        for _, future in self._results.values():
+            future.cancel()
+        self._results.clear()
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Forget `key`, or all results when not given"""
+        if key is None:
+            self._results.clear()
+        else:
+            self._results.pop(key, None)
@@ -1,7 +1,34 @@
 __version__ = "0.40"
 
 __changelog__ = {
-    "unreleased":"""""",
+    "unreleased":
+    """
+        - refresh expired access token once for all concurrent requests instead of once per failed request
+        - renew access token in the background shortly before it expires
+        - reuse access token persisted in cache on plugin start while it is still valid
+        - cache user identity and revalidate it in the background instead of fetching it on every authentication
+        - stick to a single api[1-4].origin.com host and switch only when it fails, to reuse connections; log connection pool stats on shutdown
+        - route api requests to the fastest healthy host and stop using hosts which keep failing until they recover
+        - hedge slow offer, game time, lastplayed and entitlements requests with a duplicate sent to another api host
+        - fetch missing offers with bounded concurrency and limit connections per host, store each offer in cache as it arrives
+        - adapt number of concurrent requests per host to backend responsiveness and honor `Retry-After` on throttling
+        - retry requests failed for transient reasons with exponential backoff and jitter, limited by deadline and retry budget
+        - revalidate entitlements, lastplayed, favorite and hidden games, friends and subscription games with `ETag`/`Last-Modified` and reuse unchanged responses
+        - share a single backend request and its parsed result between identical concurrent requests, aborted once all of them are cancelled
+        - parse entitlements incrementally and keep only basegame entries instead of decoding the whole payload
+        - keep entitlements as compact records holding only the fields the plugin uses
+        - store only used offer fields in persistent cache (versioned), migrating offers cached by previous versions
+        - refresh cached offers older than 3 days in background while serving cached ones, evict least recently used offers no longer owned
+        - remember offers which failed to fetch (eg. delisted) and skip them with exponential backoff instead of requesting them on every sync
+        - push persistent cache at most once per 5 seconds instead of on every change, flush it on import completion and shutdown
+        - encode only persistent cache entries changed since the last push
+        - decode persistent cache sections on first use instead of on plugin start
+        - store offers and game times in persistent cache in compact, compressed encoding
+        - optionally (`ORIGIN_CACHE_STORE=sqlite`) keep offers, game times (per user) and cached http responses in a local SQLite file instead of persistent cache
+        - optionally (`ORIGIN_OFFER_CATALOG=shared`) share fetched offers between plugin processes of all accounts on the machine, per user cache keeps only offer ids
+        - fetch entitlements and lastplayed games once per sync and reuse them in `prepare_*_context` calls which follow owned games import
+        - optionally (`ORIGIN_PREFETCH=1`) start fetching entitlements, missing offers, lastplayed, favorite and hidden games and achievements right after authentication, cancelled on shutdown or identity change
+    """,
     "0.40":
     """
         - `get_local_size`: return `None` if map.crc not found instead of raising error
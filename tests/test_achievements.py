@@ -1,3 +1,5 @@
+from unittest.mock import ANY
+
 import pytest
 from galaxy.api.errors import AuthenticationRequired
 from galaxy.api.types import Achievement
@@ -240,5 +242,6 @@ async def test_achievements_parsing(
         "https://achievements.gameservices.ea.com/achievements/personas/{user_id}{specific_set}/all".format(
             user_id=user_id, specific_set="/" + explicit_set if explicit_set else ""
         ),
-        params={'lang': 'en_US', 'metadata': 'true'}
+        params={'lang': 'en_US', 'metadata': 'true'},
+        timing=ANY
     )
@@ -1,3 +1,5 @@
+import asyncio
+import time
 from unittest.mock import patch, MagicMock, ANY
 
 import pytest
@@ -107,4 +109,155 @@ async def test_refresh_token_independent_failure(http_request, http_client, crea
         await http_client.get("http://test.com")
 
     assert http_request.call_count == 2
-    auth_lost.assert_not_called()
\ No newline at end of file
+    auth_lost.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_token_single_flight(http_client, create_json_response):
+    async def request(method, url, **kwargs):
+        await asyncio.sleep(0)
+        if url == "https://accounts.ea.com/connect/auth":
+            return create_json_response({"access_token": access_token})
+        if kwargs["headers"]["AuthToken"] != "new_token":
+            raise AccessDenied()
+        return create_json_response({})
+
+    access_token = "token"
+    save_lats = MagicMock()
+    with patch("backend.HttpClient.request", side_effect=request) as http_request:
+        await http_client.authenticate({})
+        http_client.set_save_lats_callback(save_lats)
+        http_request.reset_mock()
+
+        access_token = "new_token"
+        requests_count = 20
+        await asyncio.gather(*[http_client.get("http://test.com/{}".format(i)) for i in range(requests_count)])
+
+    refresh_calls = [
+        call_ for call_ in http_request.call_args_list if call_[0][1] == "https://accounts.ea.com/connect/auth"
+    ]
+    assert len(refresh_calls) == 1
+    assert http_request.call_count == 2 * requests_count + 1
+    save_lats.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_token_failure(http_client, create_json_response):
+    async def request(method, url, **kwargs):
+        await asyncio.sleep(0)
+        if url == "https://accounts.ea.com/connect/auth" and not http_client.is_authenticated():
+            return create_json_response({"access_token": "token"})
+        raise AccessDenied()
+
+    auth_lost = MagicMock()
+    http_client.set_auth_lost_callback(auth_lost)
+    with patch("backend.HttpClient.request", side_effect=request):
+        await http_client.authenticate({})
+        results = await asyncio.gather(*[http_client.get("http://test.com") for _ in range(5)], return_exceptions=True)
+
+    assert all(isinstance(result, AccessDenied) for result in results)
+    auth_lost.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_renew_token_before_expiration(http_request, http_client, create_json_response):
+    save_lats = MagicMock()
+    http_client.set_save_lats_callback(save_lats)
+    http_request.side_effect = [
+        create_json_response({"access_token": "token", "expires_in": 0.02}),
+        create_json_response({"access_token": "new_token", "expires_in": 3600}),
+        create_json_response({})
+    ]
+    await http_client.authenticate({})
+    await asyncio.sleep(0.05)
+    assert http_request.call_count == 2
+    assert save_lats.call_count == 2
+
+    await http_client.get("http://test.com")
+    assert http_request.call_count == 3
+    headers = http_request.call_args_list[2][1]["headers"]
+    assert headers.get("AuthToken") == "new_token"
+
+
+@pytest.mark.asyncio
+async def test_refresh_expired_token_before_request(http_request, http_client, create_json_response):
+    http_request.side_effect = [
+        create_json_response({"access_token": "token", "expires_in": 3600}),
+        create_json_response({"access_token": "new_token", "expires_in": 3600}),
+        create_json_response({})
+    ]
+    await http_client.authenticate({})
+
+    with patch("backend.time.time", return_value=time.time() + 3600):
+        await http_client.get("http://test.com")
+
+    assert http_request.call_count == 3
+    headers = http_request.call_args_list[2][1]["headers"]
+    assert headers.get("AuthToken") == "new_token"
+
+
+@pytest.mark.asyncio
+async def test_renew_token_in_background_failure(http_request, http_client, create_json_response):
+    auth_lost = MagicMock()
+    http_client.set_auth_lost_callback(auth_lost)
+    http_request.side_effect = [
+        create_json_response({"access_token": "token", "expires_in": 0.02}),
+        create_json_response({"error": "login_required"})
+    ]
+    await http_client.authenticate({})
+    await asyncio.sleep(0.05)
+
+    assert http_request.call_count == 2
+    auth_lost.assert_called_once_with()
+    assert not http_client.is_authenticated()
+
+
+@pytest.mark.asyncio
+async def test_authenticate_with_cached_access_token(http_request, http_client, create_json_response):
+    save_access_token = MagicMock()
+    http_client.set_save_access_token_callback(save_access_token)
+    http_client.load_access_token_from_cache("cached_token", str(time.time() + 3600))
+    http_request.return_value = create_json_response({})
+
+    await http_client.authenticate({})
+    http_request.assert_not_called()
+    assert http_client.is_authenticated()
+
+    await http_client.get("http://test.com")
+    http_request.assert_called_once()
+    assert http_request.call_args[1]["headers"]["AuthToken"] == "cached_token"
+    save_access_token.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("access_token, expiration", [
+    ("cached_token", str(time.time() - 1)),
+    ("cached_token", str(time.time() + 10)),  # about to expire
+    ("cached_token", None),
+    (None, None),
+])
+async def test_authenticate_with_outdated_cached_access_token(
+    http_request, http_client, create_json_response, access_token, expiration
+):
+    save_access_token = MagicMock()
+    http_client.set_save_access_token_callback(save_access_token)
+    http_client.load_access_token_from_cache(access_token, expiration)
+    http_request.return_value = create_json_response({"access_token": "token", "expires_in": 3600})
+
+    await http_client.authenticate({})
+    http_request.assert_called_once_with("GET", "https://accounts.ea.com/connect/auth", params=ANY)
+    save_access_token.assert_called_once_with("token", ANY)
+
+
+@pytest.mark.asyncio
+async def test_cached_access_token_rejected(http_request, http_client, create_json_response):
+    http_client.load_access_token_from_cache("cached_token", str(time.time() + 3600))
+    await http_client.authenticate({})
+
+    http_request.side_effect = [
+        AccessDenied(),
+        create_json_response({"access_token": "new_token", "expires_in": 3600}),
+        create_json_response({})
+    ]
+    await http_client.get("http://test.com")
+    assert http_request.call_count == 3
+    assert http_request.call_args[1]["headers"]["AuthToken"] == "new_token"
@@ -1,4 +1,5 @@
 import asyncio
+import json
 from http.cookies import Morsel
 from unittest.mock import patch
 
@@ -112,3 +113,85 @@ def test_auth_lost(authenticated_plugin, http_client):
     with patch.object(authenticated_plugin, "lost_authentication") as lost_authentication:
         callback()
         lost_authentication.assert_called_with()
+
+
+def test_access_token_cache(plugin, http_client, mocker):
+    persistent_cache = {"access_token": "token", "access_token_expiration": "1600000000.5"}
+    mocker.patch.object(
+        type(plugin),
+        "persistent_cache",
+        new_callable=mocker.PropertyMock,
+        return_value=persistent_cache
+    )
+
+    plugin.handshake_complete()
+    http_client.load_access_token_from_cache.assert_called_once_with("token", "1600000000.5")
+
+    callback = http_client.set_save_access_token_callback.call_args[0][0]
+    callback("new_token", 1600003600.5)
+    assert persistent_cache["access_token"] == "new_token"
+    assert persistent_cache["access_token_expiration"] == "1600003600.5"
+
+    callback(None, None)
+    assert persistent_cache["access_token"] == ""
+    assert persistent_cache["access_token_expiration"] == ""
+
+
+def test_login_does_not_use_cached_access_token(plugin, http_client, backend_client):
+    loop = asyncio.get_event_loop()
+    backend_client.get_identity.return_value = "13", "19", "Jan"
+
+    with patch.object(plugin, "store_credentials"):
+        loop.run_until_complete(plugin.pass_login_credentials(
+            "whatever step", "whatever credentials", [{"name": "cookie", "value": "value"}]
+        ))
+
+    http_client.forget_cached_access_token.assert_called_once_with()
+
+
+def test_cached_identity(plugin, http_client, backend_client):
+    loop = asyncio.get_event_loop()
+    credentials = {"cookies": {"cookie": "value"}}
+    backend_client.get_identity.return_value = "13", "19", "Jan"
+
+    result = loop.run_until_complete(plugin.authenticate(credentials))
+    assert result == Authentication("13", "Jan")
+    backend_client.get_identity.assert_called_once_with()
+    backend_client.get_identity.reset_mock()
+
+    with patch.object(plugin, "lost_authentication") as lost_authentication:
+        result = loop.run_until_complete(plugin.authenticate(credentials))
+        assert result == Authentication("13", "Jan")
+        loop.run_until_complete(plugin._identity_revalidation_task)
+        lost_authentication.assert_not_called()
+
+    backend_client.get_identity.assert_called_once_with()
+
+
+def test_cached_identity_changed(plugin, http_client, backend_client):
+    loop = asyncio.get_event_loop()
+    plugin.persistent_cache["identity"] = '{"user_id": "13", "persona_id": "19", "user_name": "Jan"}'
+    plugin.persistent_cache["game_time"] = '{"DR:1": {"game_id": "DR:1", "time_played": 10, "last_played_time": 20}}'
+    backend_client.get_identity.return_value = "14", "20", "Piotr"
+
+    with patch.object(plugin, "lost_authentication") as lost_authentication:
+        result = loop.run_until_complete(plugin.authenticate({"cookies": {"cookie": "value"}}))
+        assert result == Authentication("13", "Jan")
+        loop.run_until_complete(plugin._identity_revalidation_task)
+        lost_authentication.assert_called_once_with()
+
+    assert json.loads(plugin.persistent_cache["identity"]) == {"user_id": "14", "persona_id": "20", "user_name": "Piotr"}
+    assert plugin._game_time_cache.get("DR:1") is None  # game times of the previous account
+
+
+def test_token_saves_coalesced_and_flushed_on_shutdown(plugin, mocker):
+    loop = asyncio.get_event_loop()
+    push_cache = mocker.patch.object(plugin, "push_cache")
+
+    for i in range(5):
+        plugin._save_lats(i)
+        plugin._save_access_token("token", 1600000000.5 + i)
+    push_cache.assert_not_called()
+
+    loop.run_until_complete(plugin.shutdown())
+    push_cache.assert_called_once_with()
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from galaxy.api.types import GameTime
+
+from backend import Offer
+from cache_codec import is_compact, pack, unpack
+from game_time_cache import GameTimeCache
+from offer_cache import OfferCache
+
+
+def test_pack_round_trip():
+    data = {"game_id": ["DR:1", "Origin.OFR.50.0000001"], "name": ["STAR WARS™ Battlefront™", None]}
+    encoded = pack(data)
+    assert isinstance(encoded, str)
+    assert is_compact(encoded)
+    assert '"' not in encoded and "\\" not in encoded  # nothing to escape in json
+    assert unpack(encoded) == data
+
+
+def test_legacy_json_is_not_compact():
+    assert not is_compact('{"DR:1": {"game_id": "DR:1", "time_played": 1}}')
+    with pytest.raises(ValueError):
+        unpack('{"DR:1": {"game_id": "DR:1", "time_played": 1}}')
+
+
+def test_offer_cache_round_trip():
+    cache = OfferCache()
+    cache.store(Offer("DR:1", "Game", "54856", "50563_54856_50844", "1024390", "game/standard"), fetched_at=10)
+    cache.store(Offer("DR:2", "Other game"), fetched_at=20)
+
+    decoded = OfferCache.from_compact(cache.encode())
+
+    assert decoded == cache
+    assert list(decoded) == ["DR:1", "DR:2"]
+    assert not decoded.changed
+
+
+def test_empty_offer_cache_round_trip():
+    assert OfferCache.from_compact(OfferCache().encode()) == {}
+
+
+def test_game_time_cache_round_trip():
+    cache = GameTimeCache({
+        "DR:1": GameTime("DR:1", 10, 1600000000),
+        "DR:2@subscription": GameTime("DR:2@subscription", 0, None),
+        "Origin.OFR.0002694": GameTime("Origin.OFR.50.0002694", 1, 1555077603),
+    })
+
+    decoded = GameTimeCache.from_compact(cache.encode())
+
+    assert decoded == cache
+    assert not decoded.changed
+
+
+def test_compact_encoding_smaller_than_json():
+    game_ids = ["Origin.OFR.50.{:07}".format(i) for i in range(1000)]
+    game_times = {game_id: GameTime(game_id, i, 1600000000 + i) for i, game_id in enumerate(game_ids)}
+    legacy = json.dumps({
+        game_id: {"game_id": game_id, "time_played": i, "last_played_time": 1600000000 + i}
+        for i, game_id in enumerate(game_ids)
+    })
+    assert len(GameTimeCache(game_times).encode()) * 4 < len(legacy)
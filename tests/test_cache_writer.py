@@ -0,0 +1,105 @@
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from galaxy.api.types import GameTime
+
+import cache_writer
+from cache_writer import CacheSection, CacheWriter
+
+
+@pytest.mark.asyncio
+async def test_changes_pushed_once_per_window():
+    push = MagicMock()
+    writer = CacheWriter(push, delay=0.01)
+
+    for _ in range(10):
+        writer.mark_dirty()
+    push.assert_not_called()
+
+    await asyncio.sleep(0.02)
+    push.assert_called_once_with()
+    assert not writer.dirty
+    assert writer.pushes == 1
+    assert writer.coalesced == 9
+
+
+@pytest.mark.asyncio
+async def test_next_change_scheduled_after_push():
+    push = MagicMock()
+    writer = CacheWriter(push, delay=0.01)
+
+    writer.mark_dirty()
+    await asyncio.sleep(0.02)
+    writer.mark_dirty()
+    await asyncio.sleep(0.02)
+
+    assert push.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_pushes_right_away_and_cancels_pending_push():
+    push = MagicMock()
+    writer = CacheWriter(push, delay=0.01)
+
+    writer.mark_dirty()
+    writer.flush()
+    push.assert_called_once_with()
+
+    await asyncio.sleep(0.02)
+    push.assert_called_once_with()
+
+
+def test_flush_when_clean_does_nothing():
+    push = MagicMock()
+    CacheWriter(push).flush()
+    push.assert_not_called()
+
+
+def test_change_without_running_loop_pushed_on_flush():
+    push = MagicMock()
+    writer = CacheWriter(push)
+
+    writer.mark_dirty()
+    assert writer.dirty
+    writer.flush()
+    push.assert_called_once_with()
+
+
+def test_section_encoding():
+    section = CacheSection({
+        "DR:1": GameTime("DR:1", 10, None),
+        "DR:2": GameTime("DR:2", 5, 1600000000)
+    })
+    assert json.loads(section.encode()) == {
+        "DR:1": {"game_id": "DR:1", "time_played": 10},
+        "DR:2": {"game_id": "DR:2", "time_played": 5, "last_played_time": 1600000000}
+    }
+
+
+def test_unchanged_section_reuses_encoded():
+    section = CacheSection({"a": [1]}, encoded='{"a": [1]}')
+    assert not section.changed
+    assert section.encode() == '{"a": [1]}'
+
+
+def test_only_changed_entries_encoded_again():
+    section = CacheSection({"a": [1], "b": [2], "c": [3]})
+    section.encode()
+    assert not section.changed
+
+    section["b"] = [4]
+    del section["c"]
+    section.pop("d", None)
+    assert section.changed
+    with patch.object(cache_writer, "_encoder", wraps=cache_writer._encoder) as encoder:
+        assert json.loads(section.encode()) == {"a": [1], "b": [4]}
+    # "b" value and 2 keys
+    assert [args[0] for args, _ in encoder.encode.call_args_list] == [[4], "a", "b"]
+
+
+def test_section_loaded_as_encoded_is_encoded_fully_after_change():
+    section = CacheSection({"a": [1], "b": [2]}, encoded='{"a": [1], "b": [2]}')
+    section["c"] = [3]
+    assert json.loads(section.encode()) == {"a": [1], "b": [2], "c": [3]}
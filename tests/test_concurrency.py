@@ -0,0 +1,170 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import aiohttp
+import pytest
+from galaxy.api.errors import BackendNotAvailable, TooManyRequests
+
+from backend import AuthenticatedHttpClient
+from concurrency import AdaptiveConcurrencyLimiter, TokenBucket, parse_retry_after
+
+
+@pytest.fixture()
+def monotonic():
+    with patch("concurrency.time.monotonic", return_value=1000.0) as monotonic_:
+        yield monotonic_
+
+
+def throttled_error(error_type, headers):
+    try:
+        raise aiohttp.ClientResponseError(MagicMock(), (), status=429, headers=headers)
+    except aiohttp.ClientResponseError:
+        try:
+            raise error_type()
+        except error_type as error:
+            return error
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "120"}, 120),
+    ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0),
+    ({"Retry-After": "soon"}, None),
+    ({}, None),
+])
+def test_parse_retry_after(headers, expected):
+    assert parse_retry_after(throttled_error(TooManyRequests, headers)) == expected
+
+
+def test_parse_retry_after_without_response():
+    assert parse_retry_after(TooManyRequests()) is None
+
+
+@pytest.mark.asyncio
+async def test_limiter_additive_increase(monotonic):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+    for _ in range(2):
+        await limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == pytest.approx(2.9, abs=0.05)
+
+    for _ in range(100):
+        await limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_limiter_multiplicative_decrease(monotonic):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1)
+    await limiter.acquire()
+    limiter.release(0.1)
+    await limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == pytest.approx(4.06, abs=0.01)
+
+    # no further decrease within the same latency period
+    await limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == pytest.approx(4.06, abs=0.01)
+
+    monotonic.return_value += 1
+    await limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == pytest.approx(2.03, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_limiter_decreases_on_rising_latency(monotonic):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, latency_tolerance=2.0, smoothing=1.0)
+    await limiter.acquire()
+    limiter.release(0.1)
+    limit = limiter.limit
+
+    await limiter.acquire()
+    limiter.release(0.5)
+    assert limiter.limit == pytest.approx(limit / 2)
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_concurrency():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=3)
+    running = 0
+    max_running = 0
+
+    async def request():
+        nonlocal running, max_running
+        await limiter.acquire()
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        limiter.release()
+
+    await asyncio.gather(*[request() for _ in range(20)])
+    assert max_running == 3
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_cancelled_waiter():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    limiter.release()
+    assert limiter.in_flight == 0
+    await limiter.acquire()
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_pause():
+    bucket = TokenBucket(rate=1000, capacity=1)
+    await bucket.acquire()
+
+    bucket.pause(0.05)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await bucket.acquire()
+    assert loop.time() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_without_rate_only_pauses():
+    bucket = TokenBucket()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(1000):
+        await bucket.acquire()
+    assert loop.time() - start < 0.5
+
+    bucket.pause(0.05)
+    start = loop.time()
+    await bucket.acquire()
+    assert loop.time() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_http_client_honors_retry_after(create_json_response):
+    client = AuthenticatedHttpClient()
+    try:
+        with patch("backend.HttpClient.request") as http_request:
+            http_request.return_value = create_json_response({"access_token": "token"})
+            await client.authenticate({})
+
+            http_request.side_effect = throttled_error(TooManyRequests, {"Retry-After": "30"})
+            with patch("concurrency.TokenBucket.pause") as pause:
+                with pytest.raises(TooManyRequests):
+                    await client.get("https://api1.origin.com/test")
+            pause.assert_called_once_with(30)
+
+            http_request.side_effect = BackendNotAvailable()
+            with pytest.raises(BackendNotAvailable):
+                await client.get("https://api1.origin.com/test")
+            assert client._traffic_control.limiter("api1.origin.com").in_flight == 0
+    finally:
+        await client.close()
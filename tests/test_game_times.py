@@ -6,6 +6,9 @@ from galaxy.api.errors import AuthenticationRequired
 from galaxy.api.types import GameTime
 from galaxy.unittest.mock import async_return_value
 
+from backend import Offer
+from cache_writer import CacheSection
+from offer_cache import OfferCache
 from plugin import OriginBackendClient
 
 # only fields important for the logic are specified
@@ -177,13 +180,8 @@ async def test_game_time_import_cached_entries(
     user_id,
     mocker
 ):
-    mocker.patch.object(
-        type(authenticated_plugin),
-        "persistent_cache",
-        new_callable=mocker.PropertyMock,
-        return_value={
-            "game_time": {game_time.game_id: game_time for game_time in GAME_TIMES}
-        }
+    authenticated_plugin._cache_sections["game_time"] = CacheSection(
+        {game_time.game_id: game_time for game_time in GAME_TIMES}
     )
 
     backend_client.get_offer.side_effect = BACKEND_OFFER_RESPONSES
@@ -267,7 +265,7 @@ async def test_game_time_import_empty_cache(
     )
 ])
 async def test_game_time_cache_decoding(raw_game_time_cache, game_time_cache, plugin, mocker):
-    persistent_cache_mock = mocker.patch.object(
+    mocker.patch.object(
         type(plugin),
         "persistent_cache",
         new_callable=mocker.PropertyMock,
@@ -275,7 +273,7 @@ async def test_game_time_cache_decoding(raw_game_time_cache, game_time_cache, pl
     )
 
     plugin.handshake_complete()
-    assert persistent_cache_mock.return_value["game_time"] == game_time_cache
+    assert plugin._game_time_cache == game_time_cache
 
 
 @pytest.mark.asyncio
@@ -292,27 +290,12 @@ async def test_game_time_import(
     offer_id = game_id.split('@')[0]
     master_title_id = "12345"
     backend_times_response = (10, 1451288960)
-    offer_cache = {
-        offer_id: {
-            "offerId": offer_id,
-            "masterTitleId": master_title_id,
-            "platforms": [
-                {
-                    "platform": "PCWIN",
-                    "multiPlayerId": None
-                }
-            ],
-        }
-    }
+    offer_cache = OfferCache()
+    offer_cache.store(Offer(offer_id, "Game", master_title_id))
     context = {master_title_id: backend_times_response[1]}
     expected = GameTime(game_id, *backend_times_response)
 
-    mocker.patch.object(
-        type(authenticated_plugin),
-        "persistent_cache",
-        new_callable=mocker.PropertyMock,
-        return_value={"offers": offer_cache}
-    )
+    authenticated_plugin._cache_sections["offers"] = offer_cache
     backend_client.get_game_time.return_value = backend_times_response
 
     assert expected == await authenticated_plugin.get_game_time(game_id, context)
@@ -0,0 +1,348 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from aiohttp import web
+from galaxy.api.errors import BackendNotAvailable, BackendTimeout, NetworkError, UnknownError
+from galaxy.unittest.mock import AsyncMock
+
+from backend import AuthenticatedHttpClient, OriginBackendClient, RequestTiming
+from host_routing import (
+    API_HOSTS, CircuitState, endpoint_template, HedgingPolicy, LatencyAwareHostRouter, PinnedHostSelector
+)
+from http_cache import BufferedResponse, CacheEntry
+
+
+def test_pinned_host_selector_sticks_to_host():
+    selector = PinnedHostSelector()
+    host = selector.select()
+    assert host in API_HOSTS
+    assert all(selector.select() == host for _ in range(10))
+
+
+def test_pinned_host_selector_failover():
+    with patch("host_routing.random.randrange", return_value=3):
+        selector = PinnedHostSelector()
+    assert selector.select() == API_HOSTS[3]
+
+    selector.report_failure(API_HOSTS[3])
+    assert selector.select() == API_HOSTS[0]
+
+    # failure of already abandoned host or not routed host is ignored
+    selector.report_failure(API_HOSTS[3])
+    selector.report_failure("https://gateway.ea.com")
+    assert selector.select() == API_HOSTS[0]
+
+
+@pytest.fixture()
+def monotonic():
+    with patch("host_routing.time.monotonic", return_value=1000.0) as monotonic_:
+        yield monotonic_
+
+
+@pytest.fixture()
+def router(monotonic):
+    with patch("host_routing.random.choice", side_effect=lambda hosts: hosts[0]):
+        yield LatencyAwareHostRouter(failure_threshold=2, reset_timeout=30, exploration_rate=0)
+
+
+def test_router_sticks_to_host_until_clearly_slower(router):
+    host = router.select()
+    assert host == API_HOSTS[0]
+    router.report_success(API_HOSTS[0], 0.10)
+    router.report_success(API_HOSTS[1], 0.08)
+    assert router.select() == API_HOSTS[0]
+
+    for _ in range(10):
+        router.report_success(API_HOSTS[0], 1.0)
+    assert router.select() == API_HOSTS[1]
+
+
+def test_router_circuit_breaker(router, monotonic):
+    router.report_success(API_HOSTS[1], 0.2)
+    assert router.select() == API_HOSTS[0]
+
+    router.report_failure(API_HOSTS[0])
+    assert router.circuit_state(API_HOSTS[0]) == CircuitState.Closed
+    router.report_failure(API_HOSTS[0])
+    assert router.circuit_state(API_HOSTS[0]) == CircuitState.Open
+    assert router.select() == API_HOSTS[1]
+
+    # failed probe opens the circuit again
+    monotonic.return_value += 30
+    assert router.select() == API_HOSTS[0]
+    assert router.circuit_state(API_HOSTS[0]) == CircuitState.HalfOpen
+    assert router.select() == API_HOSTS[1]
+    router.report_failure(API_HOSTS[0])
+    assert router.circuit_state(API_HOSTS[0]) == CircuitState.Open
+    assert router.select() == API_HOSTS[1]
+
+    # successful probe closes it
+    monotonic.return_value += 30
+    assert router.select() == API_HOSTS[0]
+    router.report_success(API_HOSTS[0], 0.1)
+    assert router.circuit_state(API_HOSTS[0]) == CircuitState.Closed
+    assert router.select() == API_HOSTS[1]  # stays on current host while it is not clearly slower
+
+
+def test_router_select_alternative(router):
+    assert router.select_alternative(API_HOSTS[0]) == API_HOSTS[1]
+    router.report_success(API_HOSTS[1], 0.5)
+    router.report_success(API_HOSTS[2], 0.1)
+    assert router.select_alternative(API_HOSTS[0]) == API_HOSTS[2]
+    for host in API_HOSTS[1:]:
+        for _ in range(2):
+            router.report_failure(host)
+    assert router.select_alternative(API_HOSTS[0]) is None
+
+
+def test_router_ignores_unknown_hosts(router):
+    router.report_failure("https://gateway.ea.com")
+    router.report_success("https://gateway.ea.com", 0.1)
+    assert router.select() == API_HOSTS[0]
+
+
+@pytest.mark.asyncio
+async def test_backend_client_reports_latency(http_client, monotonic):
+    selector = PinnedHostSelector()
+    selector.report_success = MagicMock()
+    host = selector.select()
+
+    def get(*args, **kwargs):
+        monotonic.return_value += 0.25
+        response = MagicMock()
+        response.json = AsyncMock(return_value={})
+        return response
+
+    http_client.get.side_effect = get
+    with patch("backend.time.monotonic", monotonic):
+        await OriginBackendClient(http_client, selector).get_offer("DR:119971300")
+
+    selector.report_success.assert_called_once_with(host, 0.25)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [BackendNotAvailable(), BackendTimeout(), NetworkError()])
+async def test_backend_client_reports_host_failure(http_client, error):
+    selector = PinnedHostSelector()
+    selector.report_failure = MagicMock()
+    host = selector.select()
+    http_client.get.side_effect = error
+
+    with pytest.raises(type(error)):
+        await OriginBackendClient(http_client, selector).get_offer("DR:119971300")
+
+    selector.report_failure.assert_called_once_with(host)
+
+
+@pytest.mark.asyncio
+async def test_backend_client_does_not_switch_host_on_other_errors(http_client):
+    selector = PinnedHostSelector()
+    selector.report_failure = MagicMock()
+    http_client.get.side_effect = UnknownError()
+
+    with pytest.raises(UnknownError):
+        await OriginBackendClient(http_client, selector).get_offer("DR:119971300")
+
+    selector.report_failure.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_connection_pool_stats():
+    async def handler(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    client = AuthenticatedHttpClient()
+    try:
+        for _ in range(3):
+            response = await client.request("GET", "http://127.0.0.1:{}/".format(port))
+            await response.text()
+        assert client.pool_stats == {"127.0.0.1": {"opened": 1, "reused": 2}}
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_hedging_policy_delay():
+    policy = HedgingPolicy(percentile=90, initial_delay=1.0, min_delay=0.05, max_delay=2.0, min_samples=10)
+    assert policy.delay() == 1.0
+
+    for latency in range(1, 11):
+        policy.record(latency / 10)
+    assert policy.delay() == pytest.approx(0.9)
+
+    for _ in range(100):
+        policy.record(0.001)
+    assert policy.delay() == 0.05
+
+    for _ in range(100):
+        policy.record(10)
+    assert policy.delay() == 2.0
+
+
+def test_hedging_policy_delay_per_endpoint():
+    policy = HedgingPolicy(initial_delay=1.0, min_delay=0.05, min_samples=10)
+    for _ in range(20):
+        policy.record(3.0, "/atom/users/{}/games/lastplayed")
+        policy.record(0.1, "/ecommerce2/public/supercat/{}/en_US")
+
+    assert policy.delay("/atom/users/{}/games/lastplayed") == 3.0
+    assert policy.delay("/ecommerce2/public/supercat/{}/en_US") == 0.1
+    assert policy.delay("/ecommerce2/consolidatedentitlements/{}") == 1.0
+
+
+def test_endpoint_template():
+    assert endpoint_template("/ecommerce2/public/supercat/Origin.OFR.50.0000001/en_US") == \
+        endpoint_template("/ecommerce2/public/supercat/DR:119971300/en_US") == \
+        "/ecommerce2/public/supercat/{}/en_US"
+    assert endpoint_template("/ecommerce2/consolidatedentitlements/123?machine_hash=1") == \
+        "/ecommerce2/consolidatedentitlements/{}"
+
+
+@pytest.mark.asyncio
+async def test_latency_recorded_per_endpoint_until_headers(http_client, create_json_response):
+    policy = HedgingPolicy(initial_delay=1.0, min_samples=1)
+    backend_client = OriginBackendClient(http_client, PinnedHostSelector(), policy)
+
+    async def get(url, timing, **kwargs):
+        if "lastplayed" in url:
+            # waited in local queue and body read by http cache took long, headers came after 0.2 s
+            await asyncio.sleep(0.05)
+            timing.headers_latency = 0.2
+            return BufferedResponse(CacheEntry(None, None, b"", "application/xml", None))
+        return create_json_response({"offerId": "1"})
+
+    http_client.get = MagicMock(side_effect=get)
+    await backend_client._get_api("/atom/users/1/games/lastplayed", hedged=True)
+    await backend_client.get_offer("1")
+
+    assert policy.delay("/atom/users/{}/games/lastplayed") == 0.2
+    assert policy.delay("/ecommerce2/public/supercat/{}/en_US") == 0.05  # min delay, not lastplayed latency
+
+
+@pytest.fixture()
+def hedged_backend_client(http_client):
+    with patch("host_routing.random.randrange", return_value=0), \
+            patch("host_routing.random.choice", side_effect=lambda hosts: hosts[0]):
+        selector = PinnedHostSelector()
+        yield OriginBackendClient(http_client, selector, HedgingPolicy(initial_delay=0.01))
+
+
+def create_delayed_get(delays, results, calls):
+    async def get(url, timing, **kwargs):
+        host = url.split("/ecommerce2")[0]
+        calls.append(host)
+        timing.sent.set()
+        try:
+            await asyncio.sleep(delays[host])
+        except asyncio.CancelledError:
+            calls.append("cancelled " + host)
+            raise
+        result = results[host]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return get
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_not_needed(http_client, hedged_backend_client, create_json_response):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_delayed_get(
+        {API_HOSTS[0]: 0}, {API_HOSTS[0]: create_json_response({"offerId": "1"})}, calls
+    ))
+
+    assert await hedged_backend_client.get_offer("1") == {"offerId": "1"}
+    assert calls == [API_HOSTS[0]]
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins(http_client, hedged_backend_client, create_json_response):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_delayed_get(
+        {API_HOSTS[0]: 1, API_HOSTS[1]: 0},
+        {API_HOSTS[0]: create_json_response({"offerId": "slow"}), API_HOSTS[1]: create_json_response({"offerId": "1"})},
+        calls
+    ))
+
+    assert await hedged_backend_client.get_offer("1") == {"offerId": "1"}
+    await asyncio.sleep(0)
+    assert calls == [API_HOSTS[0], API_HOSTS[1], "cancelled " + API_HOSTS[0]]
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_primary_fails(http_client, hedged_backend_client, create_json_response):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_delayed_get(
+        {API_HOSTS[0]: 0.02, API_HOSTS[1]: 0.05},
+        {API_HOSTS[0]: BackendNotAvailable(), API_HOSTS[1]: create_json_response({"offerId": "1"})},
+        calls
+    ))
+
+    assert await hedged_backend_client.get_offer("1") == {"offerId": "1"}
+    assert calls == [API_HOSTS[0], API_HOSTS[1]]
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_both_fail(http_client, hedged_backend_client):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_delayed_get(
+        {API_HOSTS[0]: 0.02, API_HOSTS[1]: 0},
+        {API_HOSTS[0]: BackendTimeout(), API_HOSTS[1]: BackendNotAvailable()},
+        calls
+    ))
+
+    with pytest.raises(BackendTimeout):
+        await hedged_backend_client.get_offer("1")
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_not_sent_while_primary_queued_locally(
+    http_client, hedged_backend_client, create_json_response
+):
+    calls = []
+
+    async def get(url, timing, **kwargs):
+        host = url.split("/ecommerce2")[0]
+        calls.append(host)
+        await asyncio.sleep(0.05)  # eg. waiting for concurrency limit slot
+        timing.sent.set()
+        await asyncio.sleep(0.005)
+        return create_json_response({"offerId": "1"})
+
+    http_client.get = MagicMock(side_effect=get)
+
+    assert await hedged_backend_client.get_offer("1") == {"offerId": "1"}
+    assert calls == [API_HOSTS[0]]
+
+
+@pytest.mark.asyncio
+async def test_http_client_timing_excludes_local_queueing(create_json_response):
+    client = AuthenticatedHttpClient()
+    try:
+        with patch("backend.HttpClient.request") as http_request:
+            http_request.return_value = create_json_response({"access_token": "token"})
+            await client.authenticate({})
+
+            async def request(*args, **kwargs):
+                await asyncio.sleep(0.05)
+                return create_json_response({})
+
+            http_request.side_effect = request
+            client._traffic_control.limiter("api1.origin.com").limit = 1
+            timings = [RequestTiming(), RequestTiming()]
+            await asyncio.gather(*(client.get("https://api1.origin.com/test", timing=timing) for timing in timings))
+
+        # the second request waited for the first one to release its slot
+        assert all(timing.sent.is_set() for timing in timings)
+        assert all(0.05 <= timing.headers_latency < 0.09 for timing in timings)
+    finally:
+        await client.close()
@@ -0,0 +1,143 @@
+from unittest.mock import MagicMock
+
+import pytest
+from aiohttp import web
+
+from backend import AuthenticatedHttpClient
+from http_cache import HttpCache, MissingCacheEntry
+
+
+@pytest.fixture()
+async def server():
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        if request.path == "/no-validators":
+            return web.json_response({"user": request.query.get("user")})
+        return web.json_response({"user": request.query.get("user")}, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield MagicMock(requests=requests, url="http://127.0.0.1:{}".format(runner.addresses[0][1]))
+    await runner.cleanup()
+
+
+@pytest.fixture()
+async def http_client():
+    client = AuthenticatedHttpClient()
+    client._access_token = "token"
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_revalidated_response_served_from_cache(server, http_client):
+    http_client.set_cache_scope("user")
+    url = server.url + "/entitlements?user=1"
+
+    response = await http_client.get(url, cache=True)
+    assert await response.json() == {"user": "1"}
+    assert "If-None-Match" not in server.requests[0].headers
+
+    response = await http_client.get(url, cache=True)
+    assert await response.json() == {"user": "1"}
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+    assert http_client.cache_stats == {"hits": 1, "bytes_saved": len(b'{"user": "1"}')}
+
+
+@pytest.mark.asyncio
+async def test_not_cached_without_opt_in_scope_or_validators(server, http_client):
+    url = server.url + "/entitlements?user=1"
+    await http_client.get(url, cache=True)  # no scope
+    http_client.set_cache_scope("user")
+    await http_client.get(url)  # no opt-in
+    await http_client.get(server.url + "/no-validators", cache=True)
+    await http_client.get(server.url + "/no-validators", cache=True)
+
+    assert all("If-None-Match" not in request.headers for request in server.requests)
+    assert http_client.cache_stats["hits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_separated_per_user(server, http_client):
+    url = server.url + "/entitlements?user=1"
+    http_client.set_cache_scope("user_1")
+    await http_client.get(url, cache=True)
+
+    http_client.set_cache_scope("user_2")
+    await http_client.get(url, cache=True)
+
+    assert "If-None-Match" not in server.requests[1].headers
+
+
+def test_cache_key():
+    cache = HttpCache()
+    assert cache.key("https://api1.origin.com/path") is None
+
+    cache.set_scope("user")
+    assert cache.key("https://api1.origin.com/path") == cache.key("https://api3.origin.com/path")
+    assert cache.key("https://api1.origin.com/path") != cache.key("https://gateway.ea.com/path")
+    assert cache.key("https://api1.origin.com/path", headers={"Accept": "a"}) != \
+        cache.key("https://api1.origin.com/path", headers={"Accept": "b"})
+    assert cache.key("https://api1.origin.com/path", params={"a": "1"}) != cache.key("https://api1.origin.com/path")
+
+
+@pytest.mark.asyncio
+async def test_cache_size_bound():
+    async def read():
+        return b"x" * 4
+
+    cache = HttpCache(max_size=10)
+    cache.set_scope("user")
+    for path in ("a", "b", "c"):
+        response = MagicMock(status=200, headers={"ETag": '"v1"'}, content_type="application/json", charset=None)
+        response.read = read
+        await cache.handle_response(cache.key("http://test.com/" + path), response)
+
+    assert cache.conditional_headers(cache.key("http://test.com/a")) == {}
+    assert cache.conditional_headers(cache.key("http://test.com/b")) == {"If-None-Match": '"v1"'}
+    assert cache.conditional_headers(cache.key("http://test.com/c")) == {"If-None-Match": '"v1"'}
+
+
+@pytest.mark.asyncio
+async def test_not_modified_without_entry_is_requested_again(server, http_client):
+    http_client.set_cache_scope("user")
+    url = server.url + "/entitlements?user=1"
+    await http_client.get(url, cache=True)
+
+    cache = http_client._http_cache
+    conditional_headers = cache.conditional_headers
+
+    def evicted_while_revalidating(key):
+        headers = conditional_headers(key)
+        cache.clear()
+        return headers
+
+    cache.conditional_headers = evicted_while_revalidating
+    response = await http_client.get(url, cache=True)
+
+    assert await response.json() == {"user": "1"}
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+    assert "If-None-Match" not in server.requests[2].headers
+    assert conditional_headers(cache.key(url)) == {"If-None-Match": '"v1"'}  # stored again, with the body
+
+
+@pytest.mark.asyncio
+async def test_not_modified_body_never_stored():
+    cache = HttpCache()
+    cache.set_scope("user")
+    key = cache.key("http://test.com/a")
+    response = MagicMock(status=304, headers={"ETag": '"v1"'}, content_type="application/json", charset=None)
+
+    with pytest.raises(MissingCacheEntry):
+        await cache.handle_response(key, response)
+
+    response.release.assert_called_once_with()
+    assert cache.conditional_headers(key) == {}
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from json_stream import iter_array_items
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def collect(chunks, key):
+    return [item async for item in iter_array_items(chunks, key)]
+
+
+DOCUMENT = {
+    "other": {"entitlements": "not this one"},
+    "entitlements": [
+        {"offerId": "DR:1", "offerType": "basegame", "name": "Pokémon ™ [1], {x}"},
+        {"offerId": "DR:2", "offerType": "dlc", "nested": {"list": [1, 2, {"a": "]"}]}},
+        {"offerId": "DR:3", "offerType": "basegame"}
+    ],
+    "after": 1
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64 * 1024])
+@pytest.mark.parametrize("indent", [None, 4])
+async def test_iter_array_items(chunk_size, indent):
+    data = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False).encode("utf-8")
+    assert await collect(chunked(data, chunk_size), "entitlements") == DOCUMENT["entitlements"]
+
+
+@pytest.mark.asyncio
+async def test_iter_empty_array():
+    assert await collect(chunked(b'{"entitlements": [ ]}', 3), "entitlements") == []
+
+
+@pytest.mark.asyncio
+async def test_iter_missing_key():
+    with pytest.raises(KeyError):
+        await collect(chunked(b'{"error": "failure"}', 3), "entitlements")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("data", [
+    b'{"entitlements": [{"offerId": "DR:1"}, {"offerId": ',
+    b'{"entitlements": [{"offerId": "DR:1"}',
+    b'{"entitlements": [{"offerId" "DR:1"}]}',
+])
+async def test_iter_malformed(data):
+    with pytest.raises(ValueError):
+        await collect(chunked(data, 5), "entitlements")
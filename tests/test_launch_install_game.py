@@ -1,6 +1,7 @@
-from unittest.mock import Mock
 import pytest
 
+from backend import Offer
+
 
 @pytest.fixture
 def browser_open(mocker):
@@ -65,12 +66,7 @@ async def test_install_activated_subscription_game(authenticated_plugin, browser
     game_id = "Origin.OFR.50.0001051@subscription"
     expected_uri = f"origin2://game/download?offerId={game_id}"
 
-    mocker.patch.object(
-        type(authenticated_plugin),
-        "persistent_cache",
-        new_callable=mocker.PropertyMock,
-        return_value={"offers": {offer_id: Mock(dict)}},
-    )
+    authenticated_plugin._offer_id_cache.store(Offer(offer_id, "Game"))
 
     await authenticated_plugin.install_game(game_id)
     browser_open.assert_called_once_with(expected_uri)
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+from backend import Offer
+from offer_cache import CachedOffer, FailedOffer, OfferCache, OfferFailures
+
+
+def offer(offer_id):
+    return Offer(offer_id, "Game " + offer_id)
+
+
+def test_lookup_missing():
+    assert OfferCache().lookup("DR:1") is None
+
+
+def test_store_and_lookup():
+    cache = OfferCache()
+    with patch("offer_cache.time.time", return_value=100):
+        cache.store(offer("DR:1"))
+    assert cache.lookup("DR:1") == offer("DR:1")
+    assert cache["DR:1"] == CachedOffer(offer("DR:1"), 100)
+
+
+def test_staleness():
+    cache = OfferCache(ttl=10)
+    cache.store(offer("DR:1"), fetched_at=100)
+    with patch("offer_cache.time.time", return_value=110):
+        assert not cache.is_stale("DR:1")
+    with patch("offer_cache.time.time", return_value=111):
+        assert cache.is_stale("DR:1")
+
+
+def test_lookup_marks_recently_used():
+    cache = OfferCache()
+    for offer_id in ["DR:1", "DR:2", "DR:3"]:
+        cache.store(offer(offer_id))
+    cache.lookup("DR:1")
+    assert list(cache) == ["DR:2", "DR:3", "DR:1"]
+
+
+def test_evict_least_recently_used_not_owned():
+    cache = OfferCache(max_size=2)
+    for offer_id in ["DR:1", "DR:2", "DR:3", "DR:4"]:
+        cache.store(offer(offer_id))
+
+    assert cache.evict(owned_offer_ids={"DR:1"}) == 2
+    assert list(cache) == ["DR:1", "DR:4"]
+
+
+def test_owned_offers_never_evicted():
+    cache = OfferCache(max_size=1)
+    for offer_id in ["DR:1", "DR:2", "DR:3"]:
+        cache.store(offer(offer_id))
+
+    assert cache.evict(owned_offer_ids={"DR:1", "DR:2", "DR:3"}) == 0
+    assert len(cache) == 3
+
+
+def test_evict_within_bound():
+    cache = OfferCache(max_size=2)
+    cache.store(offer("DR:1"))
+    assert cache.evict(owned_offer_ids=set()) == 0
+    assert list(cache) == ["DR:1"]
+
+
+def test_failure_backoff_doubles_up_to_limit():
+    failures = OfferFailures(retry_delay=10, max_retry_delay=30)
+    with patch("offer_cache.time.time", return_value=100):
+        assert failures.record_failure("DR:1") == FailedOffer(1, 110)
+        assert failures.record_failure("DR:1") == FailedOffer(2, 120)
+        assert failures.record_failure("DR:1") == FailedOffer(3, 130)
+        assert failures.record_failure("DR:1") == FailedOffer(4, 130)
+
+
+def test_failed_offer_skipped_until_retry_time():
+    failures = OfferFailures(retry_delay=10)
+    with patch("offer_cache.time.time", return_value=100):
+        failures.record_failure("DR:1")
+        assert failures.should_skip("DR:1")
+        assert not failures.should_skip("DR:2")
+    with patch("offer_cache.time.time", return_value=110):
+        assert not failures.should_skip("DR:1")
+
+
+def test_success_resets_failures():
+    failures = OfferFailures()
+    failures.record_failure("DR:1")
+    failures.record_success("DR:1")
+    assert not failures.should_skip("DR:1")
+    assert failures.record_failure("DR:1").failures == 1
+
+
+def test_failures_of_not_owned_offers_forgotten():
+    failures = OfferFailures()
+    failures.record_failure("DR:1")
+    failures.record_failure("DR:2")
+    failures.retain({"DR:2", "DR:3"})
+    assert list(failures) == ["DR:2"]
@@ -0,0 +1,157 @@
+import json
+import sqlite3
+
+import pytest
+
+from backend import Offer
+from offer_cache import CachedOffer, OfferCache
+from offer_catalog import CatalogOfferCache, OfferCatalog, OfferReferences
+
+
+OFFER = Offer("DR:119971300", "Battlefield 4™", "76889", "50563_76889_50844", "1024390", "game/standard")
+
+
+@pytest.fixture()
+def catalog_path(tmpdir):
+    return str(tmpdir.join("shared", "catalog.sqlite"))
+
+
+@pytest.fixture()
+def catalog(catalog_path):
+    catalog = OfferCatalog(catalog_path)
+    yield catalog
+    catalog.close()
+
+
+def test_offers_shared_between_processes(catalog, catalog_path):
+    other_process = OfferCatalog(catalog_path)
+    other_process.put([CachedOffer(OFFER, 10)])
+
+    assert catalog.get(OFFER.offer_id) == CachedOffer(OFFER, 10)
+    assert catalog.get("DR:1") is None
+    other_process.close()
+
+
+def test_offers_kept_per_locale(catalog, catalog_path):
+    catalog.put([CachedOffer(OFFER, 10)])
+    other_locale = OfferCatalog(catalog_path, locale="de_DE")
+    assert other_locale.get(OFFER.offer_id) is None
+    other_locale.close()
+
+
+def test_older_offer_does_not_replace_newer(catalog):
+    catalog.put([CachedOffer(OFFER, 20)])
+    catalog.put([CachedOffer(OFFER._replace(display_name="Old"), 10)])
+    catalog.put([CachedOffer(OFFER._replace(display_name="New"), 30), CachedOffer(Offer("DR:1", "Game"), 0)])
+
+    assert catalog.get(OFFER.offer_id) == CachedOffer(OFFER._replace(display_name="New"), 30)
+    assert catalog.get("DR:1") == CachedOffer(Offer("DR:1", "Game"), 0)
+
+
+def test_cache_keeps_only_references(catalog):
+    references = OfferReferences()
+    offers = CatalogOfferCache(catalog, references)
+    offers.store(OFFER, fetched_at=10)
+    assert offers.lookup(OFFER.offer_id) == OFFER
+    assert OFFER.offer_id in offers
+    assert catalog.get(OFFER.offer_id) is None  # until committed
+
+    offers.commit()
+
+    assert catalog.get(OFFER.offer_id) == CachedOffer(OFFER, 10)
+    assert json.loads(references.encode()) == [OFFER.offer_id]
+
+
+def test_cache_serves_offers_fetched_by_other_users(catalog):
+    catalog.put([CachedOffer(OFFER, 10)])
+    references = OfferReferences.decode([], None)
+    offers = CatalogOfferCache(catalog, references, ttl=60)
+
+    assert OFFER.offer_id not in offers
+    assert offers.lookup(OFFER.offer_id) == OFFER
+    assert offers.is_stale(OFFER.offer_id)
+    assert references.changed
+    assert OFFER.offer_id in offers
+
+
+def test_reordering_references_does_not_change_them():
+    references = OfferReferences.decode(["DR:1", "DR:2"], '["DR:1", "DR:2"]')
+    references.touch("DR:1")
+    assert not references.changed
+    assert list(references) == ["DR:2", "DR:1"]
+
+
+def test_evict_drops_only_references(catalog):
+    offers = CatalogOfferCache(catalog, OfferReferences(), max_size=1)
+    offers.store(Offer("DR:1", "Game"))
+    offers.store(Offer("DR:2", "Game"))
+    offers.store(Offer("DR:3", "Game"))
+    offers.commit()
+
+    assert offers.evict({"DR:1"}) == 2
+
+    assert list(offers.references) == ["DR:1"]
+    assert catalog.get("DR:2") is not None
+
+
+def test_plugin_moves_offers_to_catalog(plugin, mocker, monkeypatch, catalog_path):
+    monkeypatch.setenv("ORIGIN_OFFER_CATALOG", catalog_path)
+    persistent_cache = {
+        "offers": OfferCache([(OFFER.offer_id, CachedOffer(OFFER, 10))]).encode(),
+        "offers_version": "2"
+    }
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+    mocker.patch.object(plugin, "push_cache")
+
+    plugin.handshake_complete()
+    assert plugin._offer_id_cache.lookup(OFFER.offer_id) == OFFER
+    plugin._cache_writer.flush()
+
+    assert persistent_cache == {"offer_refs": json.dumps([OFFER.offer_id])}
+    catalog = OfferCatalog(catalog_path)
+    assert catalog.get(OFFER.offer_id) == CachedOffer(OFFER, 10)
+    catalog.close()
+    plugin._offer_catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_plugin_stores_fetched_offers_in_catalog(
+    authenticated_plugin, backend_client, mocker, monkeypatch, catalog_path
+):
+    monkeypatch.setenv("ORIGIN_OFFER_CATALOG", catalog_path)
+    mocker.patch.object(authenticated_plugin, "push_cache")
+    authenticated_plugin.handshake_complete()
+    backend_client.get_offer.return_value = {"offerId": "DR:1", "i18n": {"displayName": "Game"}}
+
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {"DR:1": Offer("DR:1", "Game")}
+    authenticated_plugin._cache_writer.flush()
+
+    catalog = OfferCatalog(catalog_path)
+    assert catalog.get("DR:1").offer == Offer("DR:1", "Game")
+    catalog.close()
+    authenticated_plugin._offer_catalog.close()
+
+
+def test_catalog_error_is_cache_miss(catalog, mocker):
+    catalog.put([CachedOffer(OFFER, 10)])
+    mocker.patch.object(catalog, "get", side_effect=sqlite3.OperationalError("database is locked"))
+    offers = CatalogOfferCache(catalog, OfferReferences())
+
+    assert offers.lookup(OFFER.offer_id) is None
+    offers.store(OFFER, fetched_at=20)
+    assert offers.lookup(OFFER.offer_id) == OFFER
+
+
+@pytest.mark.asyncio
+async def test_plugin_fetches_offers_when_catalog_fails(
+    authenticated_plugin, backend_client, mocker, monkeypatch, catalog_path
+):
+    monkeypatch.setenv("ORIGIN_OFFER_CATALOG", catalog_path)
+    mocker.patch.object(authenticated_plugin, "push_cache")
+    authenticated_plugin.handshake_complete()
+    authenticated_plugin._offer_catalog.close()  # any further access raises sqlite3.ProgrammingError
+    backend_client.get_offer.return_value = {"offerId": "DR:1", "i18n": {"displayName": "Game"}}
+
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {"DR:1": Offer("DR:1", "Game")}
@@ -1,8 +1,15 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
 from galaxy.api.types import Game, LicenseInfo
 from galaxy.api.consts import LicenseType
-from galaxy.api.errors import AuthenticationRequired, AccessDenied, UnknownError
+from galaxy.api.errors import AuthenticationRequired, AccessDenied, BackendError, BackendNotAvailable, UnknownError
 import pytest
 
+from backend import Entitlement, Offer, OriginBackendClient
+from offer_cache import CachedOffer, FailedOffer, OfferCache
+
 
 @pytest.mark.asyncio
 async def test_not_authenticated(plugin, http_client):
@@ -16,7 +23,7 @@ async def test_no_games(authenticated_plugin, backend_client, user_id):
     backend_client.get_entitlements.return_value = []
 
     result = await authenticated_plugin.get_owned_games()
-    backend_client.get_entitlements.assert_called_with(user_id)
+    backend_client.get_entitlements.assert_called_with(user_id, offer_type="basegame")
     assert result == []
 
 
@@ -162,7 +169,9 @@ async def test_own_games(
     authenticated_plugin, backend_client,
     entitlements, offers, expected
 ):
-    backend_client.get_entitlements.return_value = entitlements
+    backend_client.get_entitlements.side_effect = lambda user_id, offer_type: [
+        Entitlement.from_json(entitlement) for entitlement in entitlements if entitlement["offerType"] == offer_type
+    ]
     backend_client.get_offer.side_effect = offers
 
     result = await authenticated_plugin.get_owned_games()
@@ -174,7 +183,7 @@ async def test_access_denied(authenticated_plugin, backend_client, user_id):
     backend_client.get_entitlements.side_effect = [AccessDenied]
     with pytest.raises(AccessDenied):
         await authenticated_plugin.get_owned_games()
-    backend_client.get_entitlements.assert_called_with(user_id)
+    backend_client.get_entitlements.assert_called_with(user_id, offer_type="basegame")
 
 
 @pytest.mark.asyncio
@@ -204,16 +213,333 @@ async def test_cache(authenticated_plugin, backend_client, mocker):
             }
         }
     ]
-    offer_id_cache = {
-        offer["offerId"]: offer for offer in OFFERS
+    offer_id_cache = OfferCache()
+    for offer in OFFERS:
+        offer_id_cache.store(Offer.from_json(offer))
+    authenticated_plugin._cache_sections["offers"] = offer_id_cache
+    backend_client.get_entitlements.return_value = [Entitlement.from_json(entitlement) for entitlement in ENTITLEMENTS]
+    await authenticated_plugin.get_owned_games()
+    backend_client.get_entitlements.assert_called_once()
+    backend_client.get_offer.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_offers_fetch_concurrency_bounded(authenticated_plugin, backend_client):
+    offer_ids = ["DR:{}".format(i) for i in range(50)]
+    in_flight = 0
+    max_in_flight = 0
+
+    async def get_offer(offer_id):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        if offer_id == "DR:7":
+            raise UnknownError("404")
+        return {"offerId": offer_id, "i18n": {"displayName": offer_id}}
+
+    authenticated_plugin._offers_fetch_concurrency = 5
+    backend_client.get_offer = MagicMock(side_effect=get_offer)
+
+    offers = await authenticated_plugin._get_offers(offer_ids)
+
+    assert max_in_flight == 5
+    assert set(offers) == set(offer_ids) - {"DR:7"}
+    assert set(authenticated_plugin._offer_id_cache) == set(offer_ids) - {"DR:7"}
+
+
+@pytest.mark.asyncio
+async def test_entitlements_parsing(http_client):
+    data = json.dumps({
+        "entitlements": [
+            {"offerId": "DR:119971300", "offerType": "basegame"},
+            {"offerId": "DR:113311", "offerType": "dlc"},
+        ]
+    }).encode("utf-8")
+
+    async def iter_chunked(size):
+        for i in range(0, len(data), 10):
+            yield data[i:i + 10]
+
+    response = MagicMock()
+    response.content.iter_chunked = iter_chunked
+    http_client.get.return_value = response
+    backend_client = OriginBackendClient(http_client)
+
+    assert await backend_client.get_entitlements("1", offer_type="basegame") == [
+        Entitlement(offer_id="DR:119971300", offer_type="basegame", external_type=None)
+    ]
+    assert len(await backend_client.get_entitlements("1")) == 2
+
+
+SUPERCAT_OFFER = {
+    "offerId": "DR:119971300",
+    "offerType": "Base Game",
+    "masterTitleId": "54856",
+    "gdpPath": "need-for-speed/need-for-speed-shift/standard-edition",
+    "i18n": {"displayName": "Need for Speed SHIFT", "longDescription": "...", "packArtLarge": "..."},
+    "platforms": [
+        {"platform": "PCMAC", "achievementSetOverride": "50563_54856_50844", "multiPlayerId": None},
+        {"platform": "PCWIN", "achievementSetOverride": "50563_54856_50844", "multiPlayerId": "1024390"}
+    ],
+    "softwareLocales": ["en_US", "de_DE"]
+}
+
+PROJECTED_OFFER = Offer(
+    "DR:119971300",
+    "Need for Speed SHIFT",
+    "54856",
+    "50563_54856_50844",
+    "1024390",
+    "need-for-speed/need-for-speed-shift/standard-edition"
+)
+
+
+def test_offer_projection():
+    assert Offer.from_json(SUPERCAT_OFFER) == PROJECTED_OFFER
+
+
+def test_offer_projection_prefers_pcwin_achievement_set():
+    offer = dict(SUPERCAT_OFFER, platforms=[
+        {"platform": "PCWIN", "achievementSetOverride": "pcwin", "multiPlayerId": None},
+        {"platform": "PCMAC", "achievementSetOverride": "pcmac", "multiPlayerId": None}
+    ])
+    assert Offer.from_json(offer).achievement_set == "pcwin"
+    assert Offer.from_json(offer).multiplayer_id is None
+
+
+@pytest.mark.asyncio
+async def test_fetched_offers_are_projected(authenticated_plugin, backend_client):
+    backend_client.get_offer.return_value = SUPERCAT_OFFER
+
+    offers = await authenticated_plugin._get_offers(["DR:119971300"])
+
+    assert offers == {"DR:119971300": PROJECTED_OFFER}
+    assert authenticated_plugin._offer_id_cache.lookup("DR:119971300") == PROJECTED_OFFER
+
+
+def compact_offers(*entries):
+    return OfferCache((entry.offer.offer_id, entry) for entry in entries).encode()
+
+
+def test_offer_cache_round_trip(plugin, mocker):
+    encoded_offers = compact_offers(CachedOffer(PROJECTED_OFFER, 1600000000.5))
+    persistent_cache = {"offers": encoded_offers, "offers_version": "2"}
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+    push_cache = mocker.patch.object(plugin, "push_cache")
+
+    plugin.handshake_complete()
+
+    assert plugin._offer_id_cache == {"DR:119971300": CachedOffer(PROJECTED_OFFER, 1600000000.5)}
+    assert not plugin._cache_writer.dirty
+    push_cache.assert_not_called()
+
+    plugin._cache_writer.mark_dirty()
+    plugin._cache_writer.flush()
+    push_cache.assert_called_once_with()
+    assert persistent_cache["offers"] is encoded_offers
+
+
+def test_json_offer_cache_stored_in_compact_encoding(plugin, mocker):
+    persistent_cache = {
+        "offers": json.dumps({"DR:119971300": CachedOffer(PROJECTED_OFFER, 1600000000.5)}),
+        "offers_version": "2"
     }
     mocker.patch.object(
-        type(authenticated_plugin),
-        "persistent_cache",
-        new_callable=mocker.PropertyMock,
-        return_value={"offers": offer_id_cache}
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
     )
-    backend_client.get_entitlements.return_value = ENTITLEMENTS
-    await authenticated_plugin.get_owned_games()
-    backend_client.get_entitlements.assert_called_once()
+    mocker.patch.object(plugin, "push_cache")
+
+    plugin.handshake_complete()
+
+    assert plugin._offer_id_cache == {"DR:119971300": CachedOffer(PROJECTED_OFFER, 1600000000.5)}
+    assert plugin._cache_writer.dirty
+    plugin._cache_writer.flush()
+    assert persistent_cache["offers"] == compact_offers(CachedOffer(PROJECTED_OFFER, 1600000000.5))
+
+
+def test_compact_offer_cache_of_unknown_version_dropped(plugin, mocker):
+    persistent_cache = {"offers": compact_offers(CachedOffer(PROJECTED_OFFER, 1600000000.5)), "offers_version": "3"}
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+
+    plugin.handshake_complete()
+
+    assert plugin._offer_id_cache == {}
+
+
+def test_offer_cache_migration(plugin, mocker):
+    persistent_cache = {
+        "offers": json.dumps({
+            "DR:119971300": SUPERCAT_OFFER,
+            "DR:1": {"offerId": "DR:1"}  # broken entry is fetched again
+        })
+    }
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+    push_cache = mocker.patch.object(plugin, "push_cache")
+
+    plugin.handshake_complete()
+
+    assert plugin._offer_id_cache == {"DR:119971300": CachedOffer(PROJECTED_OFFER, 0)}
+    assert persistent_cache["offers_version"] == "2"
+    assert plugin._cache_writer.dirty
+    push_cache.assert_not_called()
+
+    plugin._cache_writer.flush()
+    assert OfferCache.from_compact(persistent_cache["offers"]) == {"DR:119971300": CachedOffer(PROJECTED_OFFER, 0)}
+    assert len(persistent_cache["offers"]) < len(json.dumps(SUPERCAT_OFFER))
+
+
+def test_offer_cache_migration_from_projected_offers(plugin, mocker):
+    persistent_cache = {
+        "offers": json.dumps({"DR:119971300": PROJECTED_OFFER}),
+        "offers_version": "1"
+    }
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+    mocker.patch.object(plugin, "push_cache")
+
+    plugin.handshake_complete()
+
+    assert plugin._offer_id_cache == {"DR:119971300": CachedOffer(PROJECTED_OFFER, 0)}
+    assert persistent_cache["offers_version"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_stale_offer_served_and_refreshed_in_background(authenticated_plugin, backend_client):
+    authenticated_plugin._offer_id_cache.store(PROJECTED_OFFER, fetched_at=0)
+    renamed = dict(SUPERCAT_OFFER, i18n={"displayName": "Need for Speed SHIFT Remastered"})
+    backend_client.get_offer.return_value = renamed
+
+    offers = await authenticated_plugin._get_offers(["DR:119971300"])
+    assert offers == {"DR:119971300": PROJECTED_OFFER}
+
+    await authenticated_plugin._offers_refresh_task
+    backend_client.get_offer.assert_called_once_with("DR:119971300")
+    assert authenticated_plugin._offer_id_cache.lookup("DR:119971300") == Offer.from_json(renamed)
+    assert not authenticated_plugin._offer_id_cache.is_stale("DR:119971300")
+    assert authenticated_plugin._offers_refresh_task is None
+
+
+@pytest.mark.asyncio
+async def test_fresh_offer_not_refreshed(authenticated_plugin, backend_client):
+    authenticated_plugin._offer_id_cache.store(PROJECTED_OFFER)
+
+    await authenticated_plugin._get_offers(["DR:119971300"])
+
+    assert authenticated_plugin._offers_refresh_task is None
     backend_client.get_offer.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_offers_not_owned_anymore_evicted(authenticated_plugin, backend_client):
+    cache = authenticated_plugin._offer_id_cache
+    cache.max_size = 2
+    for offer_id in ["DR:1", "DR:2", "DR:3"]:
+        cache.store(Offer(offer_id, offer_id))
+    backend_client.get_entitlements.return_value = [Entitlement("DR:3", "basegame"), Entitlement("DR:1", "basegame")]
+
+    await authenticated_plugin.get_owned_games()
+
+    assert list(cache) == ["DR:3", "DR:1"]
+
+
+@pytest.mark.asyncio
+async def test_failed_offer_skipped_until_backoff_expires(authenticated_plugin, backend_client, mocker):
+    backend_client.get_offer.side_effect = UnknownError("404")
+
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    backend_client.get_offer.assert_called_once_with("DR:1")
+
+    retry_at = authenticated_plugin._failed_offers["DR:1"].retry_at
+    mocker.patch("offer_cache.time.time", return_value=retry_at)
+
+    def get_offer(offer_id):
+        if offer_id == "DR:1":
+            raise UnknownError("404")
+        return SUPERCAT_OFFER
+    backend_client.get_offer.side_effect = get_offer
+    assert await authenticated_plugin._get_offers(["DR:119971300", "DR:1"]) == {"DR:119971300": PROJECTED_OFFER}
+    assert backend_client.get_offer.call_count == 3
+    assert authenticated_plugin._failed_offers["DR:1"].failures == 2
+
+
+@pytest.mark.asyncio
+async def test_transient_offer_failure_not_remembered(authenticated_plugin, backend_client):
+    backend_client.get_offer.side_effect = BackendNotAvailable()
+
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    assert backend_client.get_offer.call_count == 2
+    assert "DR:1" not in authenticated_plugin._failed_offers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [BackendError(), AccessDenied("Failed to refresh token")])
+async def test_server_and_auth_offer_failures_not_remembered(authenticated_plugin, backend_client, error):
+    backend_client.get_offer.side_effect = error
+
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    assert backend_client.get_offer.call_count == 2
+    assert "DR:1" not in authenticated_plugin._failed_offers
+
+
+@pytest.mark.asyncio
+async def test_unexpected_offer_document_remembered(authenticated_plugin, backend_client):
+    backend_client.get_offer.return_value = {"offerId": "DR:1"}  # no i18n
+
+    assert await authenticated_plugin._get_offers(["DR:1"]) == {}
+    assert authenticated_plugin._failed_offers["DR:1"].failures == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_serving_cached_offer(authenticated_plugin, backend_client):
+    authenticated_plugin._offer_id_cache.store(PROJECTED_OFFER, fetched_at=0)
+    backend_client.get_offer.side_effect = UnknownError("404")
+
+    assert await authenticated_plugin._get_offers(["DR:119971300"]) == {"DR:119971300": PROJECTED_OFFER}
+    await authenticated_plugin._offers_refresh_task
+    assert await authenticated_plugin._get_offers(["DR:119971300"]) == {"DR:119971300": PROJECTED_OFFER}
+
+    assert authenticated_plugin._offers_refresh_task is None
+    backend_client.get_offer.assert_called_once_with("DR:119971300")
+
+
+def test_failed_offers_cache_decoding(plugin, mocker):
+    persistent_cache = {"failed_offers": json.dumps({"DR:1": FailedOffer(2, 1600000000.5)})}
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+
+    plugin.handshake_complete()
+
+    assert plugin._failed_offers == {"DR:1": FailedOffer(2, 1600000000.5)}
+
+
+def test_offer_cache_decoded_on_first_access(plugin, mocker):
+    encoded_offers = compact_offers(CachedOffer(PROJECTED_OFFER, 1600000000.5))
+    persistent_cache = {"offers": encoded_offers, "offers_version": "2"}
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+    mocker.patch.object(plugin, "push_cache")
+    decode_offers = mocker.patch.object(plugin, "_decode_compact_offers", wraps=plugin._decode_compact_offers)
+
+    plugin.handshake_complete()
+    plugin._save_lats(1)
+    plugin._cache_writer.flush()
+    decode_offers.assert_not_called()
+    assert persistent_cache["offers"] is encoded_offers
+
+    assert plugin._offer_id_cache.lookup("DR:119971300") == PROJECTED_OFFER
+    assert plugin._offer_id_cache.lookup("DR:119971300") == PROJECTED_OFFER
+    decode_offers.assert_called_once_with(encoded_offers)
@@ -0,0 +1,111 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from galaxy.api.errors import BackendNotAvailable
+
+from backend import Entitlement, OriginBackendClient
+
+
+def create_get(create_json_response, calls, error=None):
+    async def get(url, **kwargs):
+        calls.append(url)
+        await asyncio.sleep(0)
+        if error is not None:
+            raise error
+        return create_json_response({"offerId": url.rsplit("/", 2)[-2]})
+    return get
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_coalesced(http_client, create_json_response):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_get(create_json_response, calls))
+    backend_client = OriginBackendClient(http_client)
+
+    results = await asyncio.gather(
+        backend_client.get_offer("DR:1"),
+        backend_client.get_offer("DR:1"),
+        backend_client.get_offer("DR:2"),
+    )
+
+    assert results == [{"offerId": "DR:1"}, {"offerId": "DR:1"}, {"offerId": "DR:2"}]
+    assert results[0] is results[1]
+    assert len(calls) == 2
+
+    # finished requests are not reused
+    await backend_client.get_offer("DR:1")
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_coalesced_request_failure(http_client, create_json_response):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_get(create_json_response, calls, BackendNotAvailable()))
+    backend_client = OriginBackendClient(http_client)
+
+    results = await asyncio.gather(
+        backend_client.get_offer("DR:1"),
+        backend_client.get_offer("DR:1"),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, BackendNotAvailable) for result in results)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_coalesced_request(http_client, create_json_response):
+    calls = []
+    http_client.get = MagicMock(side_effect=create_get(create_json_response, calls))
+    backend_client = OriginBackendClient(http_client)
+
+    first = asyncio.ensure_future(backend_client.get_offer("DR:1"))
+    second = asyncio.ensure_future(backend_client.get_offer("DR:1"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == {"offerId": "DR:1"}
+    assert first.cancelled()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_request_cancelled_with_last_caller(http_client):
+    cancelled = []
+
+    async def get(url, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    http_client.get = MagicMock(side_effect=get)
+    backend_client = OriginBackendClient(http_client)
+
+    first = asyncio.ensure_future(backend_client.get_offer("DR:1"))
+    second = asyncio.ensure_future(backend_client.get_offer("DR:1"))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    assert cancelled == []
+
+    second.cancel()
+    await asyncio.sleep(0.01)
+    assert len(cancelled) == 1
+    assert backend_client._in_flight_requests == {}
+
+
+@pytest.mark.asyncio
+async def test_duplicated_offers_fetched_once(authenticated_plugin, backend_client):
+    backend_client.get_entitlements.return_value = [
+        Entitlement(offer_id="DR:1", offer_type="basegame"),
+        Entitlement(offer_id="DR:1", offer_type="basegame", external_type="STEAM"),
+    ]
+    backend_client.get_offer.return_value = {"offerId": "DR:1", "i18n": {"displayName": "Game"}}
+
+    games = await authenticated_plugin.get_owned_games()
+
+    assert [game.game_id for game in games] == ["DR:1", "DR:1@steam"]
+    backend_client.get_offer.assert_called_once_with("DR:1")
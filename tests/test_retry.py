@@ -0,0 +1,109 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from galaxy.api.errors import AccessDenied, BackendNotAvailable, BackendTimeout, NetworkError
+
+from backend import OriginBackendClient
+from host_routing import API_HOSTS, PinnedHostSelector
+from retry import RetryBudget, RetryPolicy
+
+
+@pytest.fixture()
+def sleep():
+    real_sleep = asyncio.sleep
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    with patch("retry.asyncio.sleep", new=fake_sleep):
+        yield delays
+
+
+def create_request(results):
+    results = list(results)
+    request = MagicMock()
+
+    async def side_effect():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    request.side_effect = side_effect
+    return request
+
+
+@pytest.mark.asyncio
+async def test_retry_transient_failures(sleep):
+    request = create_request([BackendNotAvailable(), BackendTimeout(), NetworkError(), "response"])
+    with patch("retry.random.uniform", side_effect=lambda low, high: high):
+        assert await RetryPolicy(max_attempts=4, base_delay=1, max_delay=3).run(request) == "response"
+
+    assert request.call_count == 4
+    assert sleep == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_retry_gives_up_after_max_attempts(sleep):
+    request = create_request([BackendNotAvailable(), BackendNotAvailable(), BackendTimeout()])
+    with pytest.raises(BackendTimeout):
+        await RetryPolicy(max_attempts=3).run(request)
+    assert request.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_no_retry_for_other_errors(sleep):
+    request = create_request([AccessDenied(), "response"])
+    with pytest.raises(AccessDenied):
+        await RetryPolicy().run(request)
+    assert request.call_count == 1
+    assert sleep == []
+
+
+@pytest.mark.asyncio
+async def test_retry_deadline(sleep):
+    request = create_request([BackendNotAvailable(), "response"])
+    with patch("retry.random.uniform", return_value=2):
+        with pytest.raises(BackendNotAvailable):
+            await RetryPolicy(deadline=1).run(request)
+    assert request.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_deadline_cuts_slow_attempt():
+    async def request():
+        await asyncio.sleep(1)
+
+    with pytest.raises(BackendTimeout):
+        await RetryPolicy(deadline=0.01).run(request)
+
+
+@pytest.mark.asyncio
+async def test_retry_budget(sleep):
+    budget = RetryBudget(ratio=0.5, initial_tokens=1, max_tokens=2)
+    policy = RetryPolicy(budget=budget)
+
+    assert await policy.run(create_request([BackendNotAvailable(), "response"])) == "response"
+    assert budget.tokens == 0.5
+
+    with pytest.raises(BackendNotAvailable):
+        await policy.run(create_request([BackendNotAvailable(), "response"]))
+
+    assert await policy.run(create_request(["response"])) == "response"
+    assert budget.tokens == 1
+    assert await policy.run(create_request([NetworkError(), "response"])) == "response"
+
+
+@pytest.mark.asyncio
+async def test_backend_client_retries_on_another_host(http_client, create_json_response, sleep):
+    with patch("host_routing.random.randrange", return_value=0):
+        selector = PinnedHostSelector()
+    http_client.get.side_effect = [BackendNotAvailable(), create_json_response({"offerId": "1"})]
+
+    backend_client = OriginBackendClient(http_client, selector, retry_policy=RetryPolicy())
+    assert await backend_client.get_offer("1") == {"offerId": "1"}
+
+    assert [c[0][0].split("/ecommerce2")[0] for c in http_client.get.call_args_list] == API_HOSTS[:2]
@@ -0,0 +1,233 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from galaxy.api.types import GameTime
+
+from backend import Offer
+from http_cache import CacheEntry, HttpCache
+from offer_cache import CachedOffer, OfferCache
+from sqlite_store import (
+    SqliteGameTimeCache, SqliteHttpCacheStore, SqliteOfferCache, SqliteStore, SQLITE_STORE_VERSION
+)
+
+
+OFFER = Offer("DR:119971300", "Battlefield 4™", "76889", "50563_76889_50844", "1024390", "game/standard")
+
+
+@pytest.fixture()
+def store_path(tmpdir):
+    return str(tmpdir.join("data", "cache.sqlite"))
+
+
+@pytest.fixture()
+def store(store_path):
+    store = SqliteStore(store_path)
+    yield store
+    store.close()
+
+
+def test_offers_are_read_after_commit(store, store_path):
+    offers = SqliteOfferCache(store)
+    offers.store(OFFER, fetched_at=10)
+    assert offers.lookup(OFFER.offer_id) == OFFER
+    offers.commit()
+    assert not offers.changed
+
+    reopened = SqliteStore(store_path)
+    offers = SqliteOfferCache(reopened)
+    assert offers.lookup(OFFER.offer_id) == OFFER
+    assert OFFER.offer_id in offers
+    assert "DR:1" not in offers
+    assert offers.lookup("DR:1") is None
+    reopened.close()
+
+
+def test_offers_not_committed_are_not_written(store):
+    SqliteOfferCache(store).store(OFFER, fetched_at=10)
+    assert SqliteOfferCache(store).lookup(OFFER.offer_id) is None
+
+
+def test_store_error_is_cache_miss(store):
+    offers = SqliteOfferCache(store)
+    offers.store(OFFER, fetched_at=10)
+    offers.commit()
+    store.close()  # any further access raises sqlite3.ProgrammingError
+
+    offers = SqliteOfferCache(store)
+    assert offers.lookup(OFFER.offer_id) is None
+    assert OFFER.offer_id not in offers
+
+
+def test_stale_offer(store):
+    offers = SqliteOfferCache(store, ttl=60)
+    offers.store(OFFER, fetched_at=0)
+    offers.store(Offer("DR:1", "Game"))
+    assert offers.is_stale(OFFER.offer_id)
+    assert not offers.is_stale("DR:1")
+
+
+def test_evict_least_recently_used_not_owned(store, mocker):
+    time = mocker.patch("sqlite_store.time.time", return_value=100)
+    offers = SqliteOfferCache(store, max_size=2)
+    for offer_id in ("DR:1", "DR:2", "DR:3", "DR:4"):
+        time.return_value += 1
+        offers.store(Offer(offer_id, "Game"))
+        offers.lookup(offer_id)
+    time.return_value += 1
+    offers.lookup("DR:2")
+
+    assert offers.evict({"DR:1"}) == 2
+
+    assert set(offer_id for offer_id in ("DR:1", "DR:2", "DR:3", "DR:4") if offer_id in offers) == {"DR:1", "DR:2"}
+    assert SqliteOfferCache(store).lookup("DR:3") is None
+
+
+def test_game_times(store):
+    game_times = SqliteGameTimeCache(store, "user")
+    game_times["DR:1"] = GameTime("DR:1", 10, 1600000000)
+    game_times["DR:2"] = GameTime("Origin.OFR.50.0000002", 20, None)
+    game_times.commit()
+
+    game_times = SqliteGameTimeCache(store, "user")
+    assert game_times["DR:1"] == GameTime("DR:1", 10, 1600000000)
+    assert game_times.get("DR:2") == GameTime("Origin.OFR.50.0000002", 20, None)
+    assert game_times.get("DR:3") is None
+    assert "DR:3" not in game_times
+
+
+def test_game_times_kept_per_user(store):
+    game_times = SqliteGameTimeCache(store, "user")
+    game_times["DR:1"] = GameTime("DR:1", 10, 1600000000)
+    game_times.commit()
+
+    other_user = SqliteGameTimeCache(store, "other_user")
+    assert other_user.get("DR:1") is None
+    other_user["DR:1"] = GameTime("DR:1", 20, 1600000000)
+    other_user.commit()
+    assert SqliteGameTimeCache(store, "user").get("DR:1") == GameTime("DR:1", 10, 1600000000)
+
+    other_user.forget_other_users()
+    assert SqliteGameTimeCache(store, "user").get("DR:1") is None
+    assert SqliteGameTimeCache(store, "other_user").get("DR:1") == GameTime("DR:1", 20, 1600000000)
+
+
+def test_tables_recreated_on_version_mismatch(store_path):
+    store = SqliteStore(store_path)
+    offers = SqliteOfferCache(store)
+    offers.store(OFFER)
+    offers.commit()
+    with store.transaction() as connection:
+        connection.execute("PRAGMA user_version = {}".format(SQLITE_STORE_VERSION + 1))
+    store.close()
+
+    store = SqliteStore(store_path)
+    assert SqliteOfferCache(store).lookup(OFFER.offer_id) is None
+    store.close()
+
+
+def test_failed_transaction_is_rolled_back(store):
+    with pytest.raises(RuntimeError):
+        with store.transaction() as connection:
+            connection.execute(
+                "INSERT INTO game_times (user_id, game_id, time_played) VALUES (?, ?, ?)", ("user", "DR:1", 10)
+            )
+            raise RuntimeError()
+    assert SqliteGameTimeCache(store, "user").get("DR:1") is None
+
+
+@pytest.mark.asyncio
+async def test_http_cache_entries_outlive_memory(store):
+    async def read():
+        return b"body"
+
+    cache = HttpCache()
+    cache.set_store(SqliteHttpCacheStore(store))
+    cache.set_scope("user")
+    key = cache.key("https://api1.origin.com/path", params={"a": "1"})
+    response = MagicMock(status=200, headers={"ETag": '"v1"'}, content_type="application/json", charset=None)
+    response.read = read
+    await cache.handle_response(key, response)
+
+    cache = HttpCache()
+    cache.set_store(SqliteHttpCacheStore(store))
+    cache.set_scope("user")
+    assert cache.conditional_headers(key) == {"If-None-Match": '"v1"'}
+    response = await cache.handle_response(key, MagicMock(status=304))
+    assert await response.read() == b"body"
+    assert cache.hits == 1
+
+
+def test_http_cache_store():
+    store = SqliteHttpCacheStore(SqliteStore(":memory:"))
+    entry = CacheEntry(None, "Wed, 21 Oct 2015 07:28:00 GMT", b"body", "application/json", "utf-8")
+    store.put(("user", "https://api.origin.com/path", (), ()), entry)
+    assert store.get(("user", "https://api.origin.com/path", (), ())) == entry
+    store.delete(("user", "https://api.origin.com/path", (), ()))
+    assert store.get(("user", "https://api.origin.com/path", (), ())) is None
+
+
+def test_plugin_moves_caches_to_store(plugin, mocker, store_path, monkeypatch):
+    plugin._user_id = "user"
+    monkeypatch.setenv("ORIGIN_CACHE_STORE", "sqlite")
+    mocker.patch("plugin.get_plugin_data_path", return_value=str(store_path).rsplit("/", 1)[0])
+    persistent_cache = {
+        "offers": OfferCache([(OFFER.offer_id, CachedOffer(OFFER, 10))]).encode(),
+        "offers_version": "2",
+        "game_time": json.dumps({"DR:1": {"game_id": "DR:1", "time_played": 10, "last_played_time": 20}})
+    }
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+    push_cache = mocker.patch.object(plugin, "push_cache")
+
+    plugin.handshake_complete()
+    assert plugin._offer_id_cache.lookup(OFFER.offer_id) == OFFER
+    assert plugin._game_time_cache.get("DR:1") == GameTime("DR:1", 10, 20)
+    plugin._cache_writer.flush()
+
+    push_cache.assert_called_once_with()
+    assert persistent_cache == {"cache_store": json.dumps({"path": store_path, "version": SQLITE_STORE_VERSION})}
+
+    # pointer is followed without the environment variable
+    monkeypatch.delenv("ORIGIN_CACHE_STORE")
+    plugin.handshake_complete()
+    assert plugin._offer_id_cache.lookup(OFFER.offer_id) == OFFER
+    assert plugin._game_time_cache.get("DR:1") == GameTime("DR:1", 10, 20)
+    plugin._sqlite_store.close()
+
+
+def test_plugin_falls_back_to_persistent_cache(plugin, mocker, tmpdir):
+    persistent_cache = {"cache_store": json.dumps({"path": str(tmpdir), "version": SQLITE_STORE_VERSION})}
+    mocker.patch.object(
+        type(plugin), "persistent_cache", new_callable=mocker.PropertyMock, return_value=persistent_cache
+    )
+
+    plugin.handshake_complete()  # a directory can not be opened
+
+    assert isinstance(plugin._offer_id_cache, OfferCache)
+
+
+@pytest.mark.asyncio
+async def test_plugin_drops_game_times_of_previous_account(plugin, backend_client, mocker, tmpdir, monkeypatch):
+    monkeypatch.setenv("ORIGIN_CACHE_STORE", "sqlite")
+    mocker.patch("plugin.get_plugin_data_path", return_value=str(tmpdir))
+    mocker.patch.object(plugin, "push_cache")
+    mocker.patch.object(plugin, "store_credentials")
+    plugin.handshake_complete()
+    cookies = [{"name": "cookie", "value": "value"}]
+
+    backend_client.get_identity.return_value = "13", "19", "Jan"
+    await plugin.pass_login_credentials("step", "credentials", cookies)
+    plugin._game_time_cache["DR:1"] = GameTime("DR:1", 10, 1600000000)
+    plugin._cache_writer.flush()
+
+    # Galaxy dropped the persistent cache, the same store is opened again
+    plugin.persistent_cache.clear()
+    plugin.handshake_complete()
+    backend_client.get_identity.return_value = "14", "20", "Piotr"
+    await plugin.pass_login_credentials("step", "credentials", cookies)
+
+    assert plugin._game_time_cache.get("DR:1") is None
+    assert SqliteGameTimeCache(plugin._sqlite_store, "13").get("DR:1") is None
+    plugin._sqlite_store.close()
@@ -0,0 +1,153 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from galaxy.api.errors import BackendNotAvailable
+
+from backend import Entitlement, Offer, OriginBackendClient
+from sync_session import SyncSession
+
+
+@pytest.mark.asyncio
+async def test_result_reused_until_invalidated():
+    calls = []
+
+    async def fetch():
+        calls.append(None)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    session = SyncSession()
+    assert await asyncio.gather(session.get("key", fetch), session.get("key", fetch)) == [1, 1]
+    assert await session.get("key", fetch) == 1
+    assert await session.get("other", fetch) == 2
+    assert session.hits == 2
+
+    session.invalidate("key")
+    assert await session.get("key", fetch) == 3
+    assert await session.get("other", fetch) == 2
+
+    session.invalidate()
+    assert await session.get("other", fetch) == 4
+
+
+@pytest.mark.asyncio
+async def test_result_expires(mocker):
+    monotonic = mocker.patch("sync_session.time.monotonic", return_value=100)
+    fetch = mocker.MagicMock(side_effect=lambda: asyncio.sleep(0, result="result"))
+    session = SyncSession(ttl=10)
+
+    await session.get("key", fetch)
+    monotonic.return_value = 110
+    await session.get("key", fetch)
+    assert fetch.call_count == 1
+
+    monotonic.return_value = 111
+    await session.get("key", fetch)
+    assert fetch.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failure_not_reused():
+    calls = []
+
+    async def fetch():
+        calls.append(None)
+        if len(calls) == 1:
+            raise BackendNotAvailable()
+        return "result"
+
+    session = SyncSession()
+    with pytest.raises(BackendNotAvailable):
+        await session.get("key", fetch)
+    assert await session.get("key", fetch) == "result"
+
+
+@pytest.mark.asyncio
+async def test_entitlements_fetched_once_per_sync(authenticated_plugin, backend_client, user_id):
+    backend_client.get_entitlements.return_value = [Entitlement("DR:1", "basegame")]
+    authenticated_plugin._offer_id_cache.store(Offer("DR:1", "Game", achievement_set="set"))
+    backend_client.get_achievements.return_value = {}
+
+    await authenticated_plugin.get_owned_games()
+    context = await authenticated_plugin.prepare_achievements_context(["DR:1"])
+
+    assert context.owned_games == {"DR:1": "set"}
+    backend_client.get_entitlements.assert_called_once_with(user_id, offer_type="basegame")
+
+    # next sync
+    await authenticated_plugin.get_owned_games()
+    assert backend_client.get_entitlements.call_count == 2
+
+
+CREDENTIALS = {"cookies": {"cookie": "value"}}
+
+
+@pytest.mark.asyncio
+async def test_first_sync_reuses_prefetched_data(
+    authenticated_plugin, backend_client, persona_id, user_id, monkeypatch
+):
+    monkeypatch.setenv("ORIGIN_PREFETCH", "1")
+    backend_client.get_entitlements.return_value = [Entitlement("DR:1", "basegame")]
+    backend_client.get_offer.return_value = {"offerId": "DR:1", "masterTitleId": "1", "i18n": {"displayName": "Game"}}
+    backend_client.get_lastplayed_games.side_effect = lambda _: asyncio.sleep(0, result={})
+    backend_client.get_favorite_games.return_value = set()
+    backend_client.get_hidden_games.return_value = set()
+    backend_client.get_achievements.return_value = {}
+
+    await authenticated_plugin.authenticate(CREDENTIALS)
+    await authenticated_plugin._prefetch_task
+
+    await authenticated_plugin.get_owned_games()
+    await authenticated_plugin.prepare_achievements_context(["DR:1"])
+    await authenticated_plugin.prepare_game_times_context(["DR:1"])
+    await authenticated_plugin.prepare_game_library_settings_context(["DR:1"])
+
+    backend_client.get_entitlements.assert_called_once_with(user_id, offer_type="basegame")
+    backend_client.get_offer.assert_called_once_with("DR:1")
+    backend_client.get_lastplayed_games.assert_called_once_with(user_id)
+    backend_client.get_favorite_games.assert_called_once_with(user_id)
+    backend_client.get_hidden_games.assert_called_once_with(user_id)
+    backend_client.get_achievements.assert_called_once_with(persona_id)
+
+    # next sync fetches again
+    await authenticated_plugin.get_owned_games()
+    assert backend_client.get_entitlements.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_no_prefetch_by_default(authenticated_plugin, backend_client):
+    await authenticated_plugin.authenticate(CREDENTIALS)
+    assert authenticated_plugin._prefetch_task is None
+    backend_client.get_entitlements.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_cancelled(authenticated_plugin, http_client, monkeypatch):
+    monkeypatch.setenv("ORIGIN_PREFETCH", "1")
+    requests = {}
+
+    async def get(url, **kwargs):
+        requests[url] = "started"
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            requests[url] = "cancelled"
+            raise
+
+    http_client.get = MagicMock(side_effect=get)
+    # requests go through coalescing of the real backend client
+    authenticated_plugin._backend_client = OriginBackendClient(http_client)
+
+    await authenticated_plugin.authenticate(CREDENTIALS)
+    authenticated_plugin._identity_revalidation_task.cancel()
+    prefetch_task = authenticated_plugin._prefetch_task
+    await asyncio.sleep(0.01)
+    assert any("consolidatedentitlements" in url for url in requests)
+    authenticated_plugin._cancel_prefetch()
+
+    with pytest.raises(asyncio.CancelledError):
+        await prefetch_task
+    await asyncio.sleep(0.01)
+    assert set(requests.values()) == {"cancelled"}
+    assert authenticated_plugin._prefetch_task is None